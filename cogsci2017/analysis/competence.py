@@ -0,0 +1,128 @@
+import os
+import cPickle
+import numpy as np
+
+
+# Competence maps of the end-of-run evaluation (eval_results of run.py logs).
+# Goals are flattened once into arrays, then all maps are built with single
+# histogram passes (np.bincount with weights) instead of loops over goals.
+
+
+fields = ["trial", "region", "goal", "x", "y", "comp_error", "arm_dist", "diva_dist", "tool", "reached"]
+
+
+def flatten_eval_results(data_competence, config_name, trials=None, toys=None, version=None):
+    """
+    Flatten data_competence[config_name][trial]["eval_results"][region][goal][toy]
+    (as dumped by analysis_retrieve.py) into a dict of 1D arrays, one entry per goal.
+    Trials without results, or evaluated by another version than version (if given,
+    see cogsci2017.evaluation), are skipped.
+
+    """
+    trials = sorted(data_competence[config_name].keys()) if trials is None else trials
+    rows = []
+    for trial in trials:
+        eval_results = data_competence[config_name][trial].get("eval_results")
+        if eval_results is None:
+            continue
+        if version is not None and data_competence[config_name][trial].get("eval_version", 1) != version:
+            continue
+        for region, region_results in eval_results.items():
+            for goal, goal_results in region_results.items():
+                for toy, res in goal_results.items():
+                    if toys is None or toy in toys:
+                        rows.append((trial, region, goal, res["toy_pos"][0], res["toy_pos"][1], res["comp_error"],
+                                     res["arm_dist"], res["diva_dist"], res["tool"], res["reached"]))
+    if len(rows) == 0:
+        return {field: np.zeros(0) for field in fields}
+    columns = zip(*rows)
+    return {field: np.array(column) for field, column in zip(fields, columns)}
+
+
+def bin_indices(x, y, bins=100, mins=(-1., -1.), maxs=(1., 1.)):
+    """ Vectorized real2map of the analysis notebook: cell indices of points, clipped to the grid """
+    i = np.trunc((np.asarray(x) - mins[0]) / (maxs[0] - mins[0]) * bins).astype(int)
+    j = np.trunc((np.asarray(y) - mins[1]) / (maxs[1] - mins[1]) * bins).astype(int)
+    return np.clip(i, 0, bins - 1), np.clip(j, 0, bins - 1)
+
+
+def histogram2d(i, j, bins, weights=None):
+    return np.bincount(i * bins + j, weights=weights, minlength=bins * bins).reshape(bins, bins).astype(float)
+
+
+def outside_disk(bins):
+    i, j = np.mgrid[0:bins, 0:bins]
+    return (i - bins / 2.) ** 2. + (j - bins / 2.) ** 2. > bins * bins / 4.
+
+
+def competence_maps(flat, bins=100, mins=(-1., -1.), maxs=(1., 1.)):
+    """
+    Mean competence error and strategy use (hand, tool, vocal) per cell.
+
+    Returns map_comp (-1 in empty cells) and the fractions map_hand, map_tool,
+    map_vocal (-1 outside the reachable disk), and map_total the goal counts.
+
+    """
+    i, j = bin_indices(flat["x"], flat["y"], bins, mins, maxs)
+    arm = flat["arm_dist"] < flat["diva_dist"]
+    tool = np.asarray(flat["tool"], dtype=bool)
+
+    map_total = histogram2d(i, j, bins)
+    map_hand = histogram2d(i, j, bins, arm & ~tool)
+    map_tool = histogram2d(i, j, bins, arm & tool)
+    map_vocal = histogram2d(i, j, bins, ~arm)
+    map_comp = histogram2d(i, j, bins, flat["comp_error"])
+
+    seen = map_total > 0
+    map_comp[seen] /= map_total[seen]
+    map_comp[~seen] = -1.
+    for m in [map_hand, map_tool, map_vocal]:
+        m[seen] /= map_total[seen]
+        m[outside_disk(bins)] = -1.
+    return dict(map_comp=map_comp, map_hand=map_hand, map_tool=map_tool, map_vocal=map_vocal, map_total=map_total)
+
+
+_baseline_maps = {}
+
+def load_baseline_map(filename='../data/motor_babbling.pickle'):
+    """ Motor babbling competence map, cached per file and modification time """
+    key = (os.path.abspath(filename), os.path.getmtime(filename))
+    if key not in _baseline_maps:
+        with open(filename, 'r') as f:
+            _baseline_maps[key] = np.asarray(cPickle.load(f))
+    return _baseline_maps[key]
+
+
+def normalize_competence(map_comp, map_comp_mb, fill_missing=True):
+    """
+    Competence relative to motor babbling: max(0, 1 - error / motor babbling error),
+    -1 in empty cells and 200 where the motor babbling map is undefined.
+    If fill_missing, empty cells inside the disk take the mean of their 4 neighbors
+    (computed from the unfilled map).
+
+    """
+    bins = map_comp.shape[0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        map_comp_norm = np.maximum(0., 1. - map_comp / map_comp_mb)
+    map_comp_norm[np.isnan(map_comp_mb)] = 200.
+    map_comp_norm[map_comp < 0.] = -1.
+
+    if fill_missing:
+        missing = (map_comp_norm == -1.) & ~outside_disk(bins)
+        padded = np.pad(map_comp_norm, 1, mode='edge')
+        neighbors = (padded[2:, 1:-1] + padded[:-2, 1:-1] + padded[1:-1, 2:] + padded[1:-1, :-2]) / 4.
+        map_comp_norm[missing] = neighbors[missing]
+    return map_comp_norm
+
+
+def strategy_by_distance(maps, bins=100):
+    """ Mean strategy use as a function of the distance to the center (in cells), normalized to sum to 1 """
+    i, j = np.mgrid[0:bins, 0:bins]
+    d = np.sqrt((i - bins / 2) ** 2 + (j - bins / 2) ** 2).astype(int)
+    inside = d < bins / 2
+    count = np.bincount(d[inside], minlength=bins / 2)
+    means = {}
+    for name in ["map_hand", "map_tool", "map_vocal"]:
+        means[name] = np.bincount(d[inside], weights=maps[name][inside], minlength=bins / 2) / count
+    total = means["map_hand"] + means["map_tool"] + means["map_vocal"]
+    return {name: mean / total for name, mean in means.items()}
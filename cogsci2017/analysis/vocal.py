@@ -0,0 +1,94 @@
+import numpy as np
+
+
+# Vocal learning curves of the runs (best_vocal_errors_evolution of the environment logs).
+# All trials are loaded once into a (trials, sounds, T) array so that the crossing
+# times, aligned windows and confidence bands are computed without loops over curves.
+
+
+def vocal_errors(data_vocal, config_name, trials=None, dtype=np.float64):
+    """
+    Stack data_vocal[config_name][trial]["errors"][i][hs] (as dumped by analysis_retrieve.py)
+    into an array errors[trial, sound, i], sounds being in the order of the trial's human_sounds
+    (the first ones are the toy names, the others the distractors).
+    Shorter curves and missing sounds are padded with NaN, trials without errors are skipped.
+
+    Returns errors, the list of trials and the array of sound names (trials, sounds).
+
+    """
+    trials = sorted(data_vocal[config_name].keys()) if trials is None else trials
+    trials = [trial for trial in trials if "errors" in data_vocal[config_name][trial]]
+    if len(trials) == 0:
+        return np.zeros((0, 0, 0), dtype=dtype), [], np.zeros((0, 0), dtype=object)
+    n_sounds = max(len(data_vocal[config_name][trial]["human_sounds"]) for trial in trials)
+    T = max(len(data_vocal[config_name][trial]["errors"]) for trial in trials)
+
+    errors = np.full((len(trials), n_sounds, T), np.nan, dtype=dtype)
+    names = np.full((len(trials), n_sounds), None, dtype=object)
+    for t, trial in enumerate(trials):
+        evolution = data_vocal[config_name][trial]["errors"]
+        human_sounds = data_vocal[config_name][trial]["human_sounds"]
+        names[t, :len(human_sounds)] = human_sounds
+        errors[t, :len(human_sounds), :len(evolution)] = [[e[hs] for e in evolution] for hs in human_sounds]
+    return errors, trials, names
+
+
+def curves(errors, sounds=slice(None)):
+    """ Curves of the selected sounds of all trials as a 2D (curves, T) array, missing curves removed """
+    c = errors[:, sounds, :].reshape((-1, errors.shape[-1]))
+    return c[~np.all(np.isnan(c), axis=1)]
+
+
+def time_limit(curves, sound_tol=0.4):
+    """
+    Vectorized time_limit of the analysis notebook: last index where the error is
+    above sound_tol (0 if never), i.e. the step before the error crosses sound_tol
+    for good. NaN padding is ignored.
+
+    """
+    above = np.asarray(curves) >= sound_tol
+    T = above.shape[-1]
+    last = T - 1 - np.argmax(above[..., ::-1], axis=-1)
+    return np.where(np.any(above, axis=-1), last, 0)
+
+
+def first_crossing(curves, sound_tol=0.4):
+    """ First index from which the error stays below sound_tol (T if it ends above) """
+    curves = np.asarray(curves)
+    lengths = np.sum(~np.isnan(curves), axis=-1)
+    tl = time_limit(curves, sound_tol)
+    ever_above = np.any(curves >= sound_tol, axis=-1)
+    return np.where(ever_above, np.minimum(tl + 1, lengths), 0)
+
+
+def synchro(curves, ta=500, tb=100, sound_tol=0.4):
+    """
+    Vectorized synchro of the analysis notebook: windows curve[tl-tb:tl+ta] aligned on
+    the time limit tl of each curve, for curves with tb < tl < length - ta.
+
+    Returns the (n, tb + ta) windows and the indices of the selected curves.
+
+    """
+    curves = np.asarray(curves)
+    lengths = np.sum(~np.isnan(curves), axis=-1)
+    tl = time_limit(curves, sound_tol)
+    selected = np.where((tl > tb) & (tl < lengths - ta))[0]
+    idx = tl[selected, None] + np.arange(-tb, ta)
+    return curves[selected[:, None], idx], selected
+
+
+def bootstrap_band(curves, n_boot=1000, alpha=0.05, rng=np.random):
+    """
+    Mean of the curves over time with a bootstrap (1 - alpha) confidence band.
+    Resamples are drawn as multinomial counts over the curves, so that all resampled
+    means are one matrix product.
+
+    Returns mean, low, high.
+
+    """
+    curves = np.asarray(curves, dtype=float)
+    n = len(curves)
+    counts = rng.multinomial(n, np.ones(n) / n, size=n_boot)
+    means = np.dot(counts, curves) / n
+    low, high = np.percentile(means, [100. * alpha / 2., 100. * (1. - alpha / 2.)], axis=0)
+    return np.mean(curves, axis=0), low, high
@@ -0,0 +1,51 @@
+import os
+import hashlib
+import numpy as np
+
+
+class TrackCache(object):
+    """Process-wide cache of the canonical system tracks and
+    basis function activations.
+
+    Tracks only depend on the DMP timing parameters, so they are
+    computed once and shared read-only between all DMP instances.
+    If cache_dir is given, arrays are stored as .npy files and
+    memory-mapped from disk, so that processes share them too.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.arrays = {}
+
+    def get(self, key, compute):
+        """Return the array stored under key, computing it if needed
+
+        key tuple: hashable description of the array
+        compute function: called without arguments to build the array
+        """
+        if key not in self.arrays:
+            self.arrays[key] = self.load_or_compute(key, compute)
+        return self.arrays[key]
+
+    def load_or_compute(self, key, compute):
+        if self.cache_dir is None:
+            array = np.array(compute())
+        else:
+            filename = os.path.join(self.cache_dir, hashlib.md5(repr(key)).hexdigest() + '.npy')
+            if not os.path.exists(filename):
+                if not os.path.exists(self.cache_dir):
+                    os.makedirs(self.cache_dir)
+                # write then rename so that concurrent processes never read a partial file
+                tmp_filename = filename + '.%d.tmp' % os.getpid()
+                with open(tmp_filename, 'wb') as f:
+                    np.save(f, np.array(compute()))
+                os.rename(tmp_filename, filename)
+            array = np.load(filename, mmap_mode='r')
+        array.flags.writeable = False
+        return array
+
+    def clear(self):
+        self.arrays = {}
+
+
+track_cache = TrackCache(os.environ.get('COGSCI2017_DMP_CACHE'))
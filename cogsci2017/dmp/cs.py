@@ -17,15 +17,18 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import numpy as np
 
+from cache import track_cache
+
 class CanonicalSystem():
     """Implementation of the canonical dynamical system
     as described in Dr. Stefan Schaal's (2002) paper"""
 
-    def __init__(self, dt, pattern='discrete'):
+    def __init__(self, dt, pattern='discrete', dtype=np.float64):
         """Default values from Schaal (2012)
         
         dt float: the timestep
         pattern string: either 'discrete' or 'rhythmic'
+        dtype numpy.dtype: floating point precision of x_track
         """
         self.ax = 1.0
 
@@ -41,10 +44,13 @@ class CanonicalSystem():
                 Please specify rhythmic or discrete.')
 
         self.dt = dt
+        self.dtype = np.dtype(dtype)
         self.timesteps = int(self.run_time / self.dt)
 
         self.reset_state()
-        self.rollout()
+        # x_track only depends on (dt, pattern, ax): shared read-only
+        self.x_track = track_cache.get(('x_track', self.dt, self.pattern, self.ax, self.dtype.str), 
+                                       lambda: self.rollout().astype(self.dtype))
         self.reset_state()
 
     def rollout(self, **kwargs):
@@ -24,7 +24,7 @@ class DMPs(object):
 
     def __init__(self, dmps, bfs, dt=.01,
                  y0=0, goal=1, w=None, 
-                 ay=None, by=None, **kwargs):
+                 ay=None, by=None, dtype=np.float64, **kwargs):
         """
         dmps int: number of dynamic motor primitives
         bfs int: number of basis functions per DMP
@@ -34,29 +34,31 @@ class DMPs(object):
         w list: tunable parameters, control amplitude of basis functions
         ay int: gain on attractor term y dynamics
         by int: gain on attractor term y dynamics
+        dtype numpy.dtype: floating point precision of the system
         """
 
         self.dmps = dmps 
         self.bfs = bfs 
         self.dt = dt
+        self.dtype = np.dtype(dtype)
         if isinstance(y0, (int, float)):
             y0 = np.ones(self.dmps)*y0 
-        self.y0 = y0
+        self.y0 = np.asarray(y0, dtype=self.dtype)
         if isinstance(goal, (int, float)):
             goal = np.ones(self.dmps)*goal
-        self.goal = goal 
+        self.goal = np.asarray(goal, dtype=self.dtype)
         if w is None: 
             # default is f = 0
             w = np.zeros((self.dmps, self.bfs))
-        self.w = w
+        self.w = np.asarray(w, dtype=self.dtype)
 
         if ay is None: ay = np.ones(dmps) * 25. # Schaal 2012
-        self.ay = ay
+        self.ay = np.asarray(ay, dtype=self.dtype)
         if by is None: by = self.ay.copy() / 4. # Schaal 2012
-        self.by = by
+        self.by = np.asarray(by, dtype=self.dtype)
 
         # set up the CS 
-        self.cs = CanonicalSystem(dt=self.dt, **kwargs)
+        self.cs = CanonicalSystem(dt=self.dt, dtype=self.dtype, **kwargs)
         self.timesteps = int(self.cs.run_time / self.dt)
 
         # set up the DMP system
@@ -76,6 +78,8 @@ class DMPs(object):
 
     def gen_psi(self): raise NotImplementedError()
 
+    def gen_psi_track(self): raise NotImplementedError()
+
     def gen_weights(self, f_target): raise NotImplementedError()
 
     def imitate_path(self, y_des):
@@ -126,12 +130,12 @@ class DMPs(object):
         timesteps = self.timesteps
 
         # set up tracking vectors
-        y_track = np.zeros((timesteps, self.dmps)) 
+        y_track = np.zeros((timesteps, self.dmps), dtype=self.dtype) 
         #dy_track = np.zeros((timesteps, self.dmps))
         #ddy_track = np.zeros((timesteps, self.dmps))
         
         if self.psi_track is None:
-            self.psi_track = self.gen_psi(self.cs.x_track) 
+            self.psi_track = self.gen_psi_track() 
             
         for t in range(timesteps):
         
@@ -147,8 +151,8 @@ class DMPs(object):
     def reset_state(self):
         """Reset the system state"""
         self.y = self.y0.copy()
-        self.dy = np.zeros(self.dmps)   
-        self.ddy = np.zeros(self.dmps)  
+        self.dy = np.zeros(self.dmps, dtype=self.dtype)   
+        self.ddy = np.zeros(self.dmps, dtype=self.dtype)  
         self.cs.reset_state()
 
     def step(self, tau=1.0, state_fb=None, x=None, psi=None):
@@ -168,7 +172,7 @@ class DMPs(object):
         # generate basis function activation
         #psi = np.exp(-self.h * (x - self.c)**2)
         xpsi_sum = x / np.sum(psi)
-        dt2 = self.dt * self.dt
+        dt2 = self.dtype.type(self.dt * self.dt)
 
         for d in range(self.dmps):
 
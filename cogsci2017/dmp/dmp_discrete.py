@@ -16,6 +16,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
 from dmp import DMPs
+from cache import track_cache
 
 import numpy as np
 
@@ -109,6 +110,16 @@ class DMPs_discrete(DMPs):
             x = x[:,None]
         return np.exp(-self.h * (x - self.c)**2)
 
+    def gen_psi_track(self):
+        """Generates the activity of the basis functions along the 
+        canonical system rollout. The result is cached process-wide 
+        and must not be modified.
+        """
+
+        key = ('psi_track', self.cs.x_track.tostring(), 
+               self.h.tostring(), self.c.tostring(), self.dtype.str)
+        return track_cache.get(key, lambda: self.gen_psi(self.cs.x_track).astype(self.dtype))
+
     def gen_weights(self, f_target):
         """Generate a set of weights over the basis functions such 
         that the target forcing term trajectory is matched.
@@ -119,11 +130,11 @@ class DMPs_discrete(DMPs):
         # calculate x and psi   
         #x_track = self.cs.rollout()
         x_track = self.cs.x_track
-        psi_track = self.gen_psi(x_track)
+        psi_track = self.gen_psi_track()
         self.psi_track = psi_track
 
         #efficiently calculate weights for BFs using weighted linear regression
-        self.w = np.zeros((self.dmps, self.bfs))
+        self.w = np.zeros((self.dmps, self.bfs), dtype=self.dtype)
         for d in range(self.dmps):
             # spatial scaling term
             k = 1.#(self.goal[d] - self.y0[d])
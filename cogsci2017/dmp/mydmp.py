@@ -7,22 +7,23 @@ from scipy.optimize import fmin_l_bfgs_b
 
 
 class MyDMP(object):
-    def __init__(self, n_dmps=4, n_bfs=6, timesteps=25, use_init=False, max_params=None):
+    def __init__(self, n_dmps=4, n_bfs=6, timesteps=25, use_init=False, max_params=None, dtype=np.float64):
         
         self.n_dmps = n_dmps
         self.n_bfs = n_bfs
         self.timesteps = timesteps
         self.max_params = max_params
+        self.dtype = np.dtype(dtype)
         self.bounds = [(-wmax, wmax) for wmax in self.max_params]
          
         if use_init:
             self.used = np.array([True]*self.n_dmps + [True]*self.n_bfs*self.n_dmps + [True]*self.n_dmps)
         else:
             self.used = np.array([False]*self.n_dmps + [True]*self.n_bfs*self.n_dmps + [True]*self.n_dmps)
-        self.default = np.array([0.] * (self.n_bfs+2) * self.n_dmps)
+        self.default = np.array([0.] * (self.n_bfs+2) * self.n_dmps, dtype=self.dtype)
         self.motor = copy(self.default)
         
-        self.dmp = DMPs_discrete(dmps=self.n_dmps, bfs=self.n_bfs, dt=1./self.timesteps)
+        self.dmp = DMPs_discrete(dmps=self.n_dmps, bfs=self.n_bfs, dt=1./self.timesteps, dtype=self.dtype)
         
 
     def trajectory(self, m):
@@ -1,13 +1,17 @@
+import copy
 import time
 import numpy as np
 import random
 import matplotlib.pyplot as plt
 
-from diva import DivaEnvironment
+from diva import DivaEnvironment, cogsci2017_config
 from arm_env import ArmEnvironment
+from renderer import EnvironmentRenderer
+from world_model import WorldModel, sensory_layout
+from ..metrics import metrics
 from explauto.utils import bounds_min_max
 from explauto.environment.environment import Environment
-from explauto.utils.utils import rand_bounds
+from ..rng import rand_bounds
 
 import pickle
 from rospkg.rospack import RosPack
@@ -28,9 +32,14 @@ colors_config = {
         
 
 class CogSci2017Environment(Environment):
-    def __init__(self, gui=False, audio=False):
+    def __init__(self, gui=False, audio=False, dtype=np.float64, gui_fps=25., gui_every=1, recorder=None, rng=None, n_tools=1, n_toys=1):
         
         self.t = 0
+        self.rng = rng if rng is not None else np.random
+        self.dtype = np.dtype(dtype)
+        self.gui_fps = gui_fps
+        self.gui_every = gui_every
+        self.recorder = recorder
         
         # ARM CONFIG
         
@@ -45,7 +54,8 @@ class CogSci2017Environment(Environment):
                         n_dmps=3, 
                         n_bfs=6, 
                         timesteps=50,
-                        gui=gui)
+                        gui=gui,
+                        dtype=self.dtype)
         
         
         # SOUND CONFIG
@@ -93,22 +103,7 @@ class CogSci2017Environment(Environment):
 
         # DIVA CONFIG
         
-        diva_cfg = dict(
-                        m_mins = np.array([-1, -1, -1, -1, -1, -1, -1]),
-                        m_maxs = np.array([1, 1, 1, 1, 1, 1, 1]),
-                        s_mins = np.array([ 7.5,  9.25]),
-                        s_maxs = np.array([ 9.5 ,  11.25]),
-                        m_used = range(7),
-                        s_used = range(1, 3),
-                        rest_position_diva = list([0]*7),
-                        audio = audio,
-                        diva_use_initial = True,
-                        diva_use_goal = True,
-                        used_diva = list([True]*7),
-                        n_dmps_diva = 7,
-                        n_bfs_diva = 2,
-                        move_steps = 50,
-                        )
+        diva_cfg = cogsci2017_config(audio=audio, dtype=self.dtype)
         
         
         
@@ -120,50 +115,70 @@ class CogSci2017Environment(Environment):
         
         # OBJECTS CONFIG
         
+        # the label of toy k is human_sounds[k] (the caregiver brings toy k when it is produced):
+        # at most one toy per caregiver sound
+        assert n_tools >= 1 and 1 <= n_toys <= len(self.human_sounds)
         self.caregiver_gives_obj_factor = 0.01
-        self.tool_length = 0.5
-        self.handle_tol = 0.2
-        self.handle_tol_sq = self.handle_tol * self.handle_tol
-        self.handle_noise = 0.
-        self.object_tol_hand = 0.2
-        self.object_tol_hand_sq = self.object_tol_hand * self.object_tol_hand
-        self.object_tol_tool = 0.2
-        self.object_tol_tool_sq = self.object_tol_tool * self.object_tol_tool
+        self.world = WorldModel(n_tools=n_tools,
+                                n_toys=n_toys,
+                                tool_length=0.5,
+                                handle_tol=0.2,
+                                handle_noise=0.,
+                                object_tol_hand=0.2,
+                                object_tol_tool=0.2)
         
         self.diva_traj = None
         self.produced_sound = None
         
+        # Sensory vector: a new array per update, or written in place in s_out if set
+        # (e.g. s_out = agent.s to share the agent's m+s buffer)
+        self.s_out = None
+        self.s_layout = sensory_layout(n_tools, n_toys)
+        self.s_context = self.s_layout["context"]
+        self.s_hand = self.s_layout["hand"]
+        self.s_tools = [self.s_layout["tool{}".format(j + 1)] for j in range(n_tools)]
+        self.s_toys = [self.s_layout["toy{}".format(k + 1)] for k in range(n_toys)]
+        self.s_tool = self.s_tools[0]
+        self.s_toy1 = self.s_toys[0]
+        self.s_sound = self.s_layout["sound"]
+        self.s_caregiver = self.s_layout["caregiver"]
+        
         Environment.__init__(self, 
                              m_mins= [-1.] * (21+28),
                              m_maxs= [1.] * (21+28),
-                             s_mins= [-1.] * 56,
-                             s_maxs= [1.] * 56)
-        
-        
-        self.current_tool = [-0.5, 0., 0.5, 0.]
-        self.current_toy1 = [0.5, 0.5, 0.]
-        #self.current_toy2 = [0.7, 0.7, 0.]
-        #self.current_toy3 = [0.9, 0.9, 0.]
+                             s_mins= [-1.] * self.s_caregiver.stop,
+                             s_maxs= [1.] * self.s_caregiver.stop)
+        self.s_mins = self.conf.s_mins.astype(self.dtype)
+        self.s_maxs = self.conf.s_maxs.astype(self.dtype)
+        
+        
+        # first tool and toy at their initial positions of the single tool and toy setup, other
+        # toys further along the diagonal, other tools at random (tools are not moved by reset)
+        self.world.tools[:1] = [-0.5, 0., 0.5, 0.]
+        for j in range(1, n_tools):
+            self.world.tools[j, :2] = self.reset_rand2d(region=1)
+            self.world.tools[j, 2] = self.rng.random_sample()
+        self.world.toys[:, :2] = 0.5 + 0.2 * np.arange(n_toys)[:, np.newaxis]
         self.current_caregiver = [0., 1.7]
         self.reset()
-        self.compute_tool()
+        self.world.compute_tool_ends()
         
         self.purge_logs()
         
         if self.arm.gui:
-            self.init_plot()
+            self.renderer = EnvironmentRenderer(self, 
+                                                max_fps=self.gui_fps, 
+                                                render_every=self.gui_every, 
+                                                colors_config=colors_config, 
+                                                toy_color=colors[3])
             
         
 
         self.count_diva = 0
         self.count_arm = 0
         self.count_tool = 0
-        self.count_toy1_by_tool = 0
-        #self.count_toy2_by_tool = 0
-        #self.count_toy3_by_tool = 0
-        self.count_toy1_by_hand = 0
-        #self.count_toy2_by_hand = 0
-        #self.count_toy3_by_hand = 0
+        self.count_toys_by_tool = np.zeros(n_toys, dtype=int)
+        self.count_toys_by_hand = np.zeros(n_toys, dtype=int)
         self.count_parent_give_label = 0
         self.count_parent_give_object = 0
         self.count_produced_sounds = {}
@@ -186,62 +201,108 @@ class CogSci2017Environment(Environment):
                     count_arm=self.count_arm,
                     count_tool=self.count_tool,
                     count_toy1_by_tool=self.count_toy1_by_tool,
-                    #count_toy2_by_tool=self.count_toy2_by_tool,
-                    #count_toy3_by_tool=self.count_toy3_by_tool,
                     count_toy1_by_hand=self.count_toy1_by_hand,
-                    #count_toy2_by_hand=self.count_toy2_by_hand,
-                    #count_toy3_by_hand=self.count_toy3_by_hand,
+                    count_toys_by_tool=self.count_toys_by_tool.tolist(),
+                    count_toys_by_hand=self.count_toys_by_hand.tolist(),
                     count_parent_give_label=self.count_parent_give_label,
                     count_parent_give_object=self.count_parent_give_object,
                     count_produced_sounds=self.count_produced_sounds,
                     )
 
+    @property
+    def count_toy1_by_tool(self):
+        return int(self.count_toys_by_tool[0])
+
+    @property
+    def count_toy1_by_hand(self):
+        return int(self.count_toys_by_hand[0])
+
+    # Mutable state of the world, of the last iteration and of the statistics
+    state_attrs = ["t", "world", "current_caregiver", "current_context",
+                   "hand", "tools_traj", "toys_traj", "caregiver", "sound", "diva_traj", "produced_sound",
+                   "logs_tools", "logs_toys", "logs_caregiver",
+                   "best_vocal_errors", "count_diva", "count_arm", "count_tool", "count_toys_by_tool", "count_toys_by_hand",
+                   "count_parent_give_label", "count_parent_give_object", "count_produced_sounds",
+                   "time_arm", "time_diva", "time_arm_per_it", "time_diva_per_it"]
+
+    def snapshot(self):
+        """ Copy of the mutable state of the environment (and of its random state), to be given to restore or simulate """
+        state = {attr: copy.deepcopy(getattr(self, attr, None)) for attr in self.state_attrs}
+        # past entries are never modified
+        state["best_vocal_errors_evolution"] = list(self.best_vocal_errors_evolution)
+        state["arm_logs"] = copy.deepcopy(getattr(self.arm, "logs", None))
+        state["rng_state"] = self.rng.get_state()
+        return state
+
+    def restore(self, state):
+        for attr in self.state_attrs:
+            setattr(self, attr, copy.deepcopy(state[attr]))
+        self.best_vocal_errors_evolution = list(state["best_vocal_errors_evolution"])
+        self.arm.logs = copy.deepcopy(state["arm_logs"])
+        self.rng.set_state(state["rng_state"])
+
+    def state_with_toys(self, state, pos1):
+        """ Copy of state (given by snapshot) with toy1 moved to pos1, and neither tool nor toy held """
+        state = dict(state)
+        world = copy.deepcopy(state["world"])
+        world.release()
+        world.toys[0, :2] = pos1
+        state["world"] = world
+        state["current_context"] = self.context(world, state["current_caregiver"])
+        return state
+
+    def simulate(self, state, m_batch):
+        """ Sensory effects (n, s_ndims) of each motor command of m_batch (n, m_ndims) executed from state
+        (given by snapshot), without changing the environment: its state, statistics, logs,
+        random state and s_out are the same after the call, and nothing is recorded. """
+        live = self.snapshot()
+        s_out, recorder = self.s_out, self.recorder
+        self.s_out, self.recorder = None, None
+        try:
+            s_batch = []
+            for m in m_batch:
+                self.restore(state)
+                s_batch.append(self.one_update(m, log=False))
+            return np.array(s_batch)
+        finally:
+            self.s_out, self.recorder = s_out, recorder
+            self.restore(live)
+
     def reset(self):
         
         if self.t % 20 == 0: 
             self.reset_toys()
         
-        self.current_tool[3] = 0.
-        self.current_toy1[2] = 0.
-        #self.current_toy2[2] = 0.
-        #self.current_toy3[2] = 0.
+        self.world.release()
         self.reset_caregiver()
         self.current_context = self.get_current_context()  
         
-        self.hand = []
-        self.tool = []
-        self.toy1 = []
-        #self.toy2 = []
-        #self.toy3 = []
-        self.caregiver = []
-        
         
     def purge_logs(self):
-        self.logs_tool = []
-        self.logs_toy1 = []
-        #self.logs_toy2 = []
-        #self.logs_toy3 = []
-        self.logs_caregiver = []
+        # per timestep: handle x, y, angle, end x, y, held of each tool, and x, y, state of each toy
+        self.logs_tools = np.zeros((self.timesteps, self.world.n_tools, 6))
+        self.logs_toys = np.zeros((self.timesteps, self.world.n_toys, 3))
+        self.logs_caregiver = np.zeros((self.timesteps, 2))
             
     def reset_tool(self):
-        self.current_tool[:2] = self.reset_rand2d(region=1)
-        self.current_tool[2] = np.random.random()
-        self.compute_tool()
+        for j in range(self.world.n_tools):
+            self.world.tools[j, :2] = self.reset_rand2d(region=1)
+            self.world.tools[j, 2] = self.rng.random_sample()
+        self.world.compute_tool_ends()
         
-    def set_tool(self, pos, angle):
-        self.current_tool[:2] = pos
-        self.current_tool[2] = angle
-        self.compute_tool()
+    def set_tool(self, pos, angle, j=0):
+        self.world.tools[j, :2] = pos
+        self.world.tools[j, 2] = angle
+        self.world.compute_tool_ends()
         
     def reset_toys(self, region=0):
-        self.current_toy1[:2] = self.reset_rand2d(region=region)
-        #self.current_toy2[:2] = self.reset_rand2d(region=region)
-        #self.current_toy3[:2] = self.reset_rand2d(region=region)
+        for k in range(self.world.n_toys):
+            self.world.toys[k, :2] = self.reset_rand2d(region=region)
         
-    def set_toys(self, pos1, pos2, pos3):
-        self.current_toy1[:2] = pos1
-        #self.current_toy2[:2] = pos2
-        #self.current_toy3[:2] = pos3
+    def set_toys(self, *positions):
+        """ Positions of the first toys (the others are ignored) """
+        for k, pos in enumerate(positions[:self.world.n_toys]):
+            self.world.toys[k, :2] = pos
         
     def reset_caregiver(self):
         self.current_caregiver = self.reset_rand2d()
@@ -251,7 +312,7 @@ class CogSci2017Environment(Environment):
                 
     def reset_rand2d(self, region=None):
         if region == 0:
-            rdm = np.random.random()
+            rdm = self.rng.random_sample()
             if rdm < 1. / 3.:
                 return self.reset_rand2d(region=1)
             elif rdm < 2. / 3.:
@@ -259,72 +320,67 @@ class CogSci2017Environment(Environment):
             else:
                 return self.reset_rand2d(region=3)
         elif region == 1:
-            alpha = 2. * np.pi * np.random.random()
-            r = np.random.random()
+            alpha = 2. * np.pi * self.rng.random_sample()
+            r = self.rng.random_sample()
             return [r * np.cos(alpha), r * np.sin(alpha)]
         elif region == 2:
-            alpha = 2. * np.pi * np.random.random()
-            r = 1. + 0.5 * np.random.random()
+            alpha = 2. * np.pi * self.rng.random_sample()
+            r = 1. + 0.5 * self.rng.random_sample()
             return [r * np.cos(alpha), r * np.sin(alpha)]  
         elif region == 3:
-            alpha = 2. * np.pi * np.random.random()
-            r = 1.5 + 0.5 * np.random.random()
+            alpha = 2. * np.pi * self.rng.random_sample()
+            r = 1.5 + 0.5 * self.rng.random_sample()
             return [r * np.cos(alpha), r * np.sin(alpha)]            
         elif region is None:
-            return [4. * np.random.random() - 2., 4. * np.random.random() - 2.]
+            return [4. * self.rng.random_sample() - 2., 4. * self.rng.random_sample() - 2.]
         
         
-    def get_current_context(self):
-        return [d / 2. for d in self.current_tool[:2] + self.current_toy1[:2] + self.current_caregiver]
+    def context(self, world, caregiver):
+        return list(np.concatenate((world.positions(), caregiver)) / 2.)
     
-    def compute_tool(self):
-        a = np.pi * self.current_tool[2]
-        self.tool_end_pos = [self.current_tool[0] + np.cos(a) * self.tool_length, 
-                        self.current_tool[1] + np.sin(a) * self.tool_length]
+    def get_current_context(self):
+        return self.context(self.world, self.current_caregiver)
         
     def compute_motor_command(self, m_ag):
         return bounds_min_max(m_ag, self.conf.m_mins, self.conf.m_maxs)
     
     def motor_babbling(self, arm=False, audio=False):
-        m = rand_bounds(self.conf.m_bounds)[0]
+        m = rand_bounds(self.conf.m_bounds, rng=self.rng)[0]
         if arm:
             r = 1.
         elif audio:
             r = 0.
         else:
-            r = np.random.random()
+            r = self.rng.random_sample()
         if r < 0.5:
             m[:21] = 0.
         else:
             m[21:] = 0.
         return m
     
-    def is_hand_free(self):
-        return self.current_tool[3] == 0 and (not self.current_toy1[2] == 1)
-    
-    def is_tool_free(self):
-        return (not self.current_toy1[2] == 2)
-
     def give_label(self, toy):
         
-        if toy == "toy1":
-            #print "Caregiver says", self.human_sounds[0] 
-            return self.human_sounds_traj[self.human_sounds[0]]
-        elif toy == "random":
-            sound_id = np.random.choice([1, 2, 3])
+        if toy == "random":
+            sound_id = self.rng.choice([1, 2, 3])
             #print "Caregiver says", self.human_sounds[sound_id]
             return self.human_sounds_traj[self.human_sounds[sound_id]]
         else:
-            raise NotImplementedError
+            # toy: index of the toy
+            #print "Caregiver says", self.human_sounds[toy] 
+            return self.human_sounds_traj[self.human_sounds[toy]]
         
     def analysis_sound(self, diva_traj):
+        return self.analysis_formants(np.array([f[0] for f in diva_traj[[0, 12, 24, 37, 49]]] + [f[1] for f in diva_traj[[0, 12, 24, 37, 49]]]))
+        
+    def analysis_formants(self, formants):
+        """ formants: the 5 first then 5 second formants of a sound, unnormalized """
         #return self.human_sounds[2]
         best = None
         is_best_found = False
         best_best = None
         best_best_sound_tol = 999
         for hs in self.human_sounds:          
-            error = np.linalg.norm(np.array(self.human_sounds_traj[hs]) - np.array([f[0] for f in diva_traj[[0, 12, 24, 37, 49]]] + [f[1] for f in diva_traj[[0, 12, 24, 37, 49]]]))
+            error = np.linalg.norm(np.array(self.human_sounds_traj[hs]) - formants)
             if error < self.best_vocal_errors[hs]:
                 self.best_vocal_errors[hs] = error
             if error < self.sound_tol:
@@ -342,9 +398,44 @@ class CogSci2017Environment(Environment):
         else:
             return None
     
-    def caregiver_moves_obj(self, caregiver_pos, current_toy):
-        middle = [caregiver_pos[0]/2, caregiver_pos[1]/2]
-        return [current_toy[0] + self.caregiver_gives_obj_factor * (middle[0] - current_toy[0]), current_toy[1] + self.caregiver_gives_obj_factor * (middle[1] - current_toy[1]), current_toy[2]]
+    def compute_interaction(self, arm_traj, cmd):
+        world = self.world
+        # parent gives object if its label is produced
+        if cmd == "diva" and self.produced_sound in self.human_sounds[:world.n_toys]:
+            given = self.human_sounds.index(self.produced_sound)
+        else:
+            given = None
+        middle = np.array(self.current_caregiver) / 2.
+        self.logs_caregiver[:] = self.current_caregiver
+        
+        for i in range(self.timesteps):
+            
+            # Arm
+            arm_x, arm_y, arm_angle = arm_traj[i]
+            
+            # Tools
+            world.move_tools(arm_x, arm_y, arm_angle, self.rng)
+            
+            # Toys
+            if cmd == "arm":
+                world.move_toys(arm_x, arm_y)
+            elif given is not None:
+                world.move_toy_toward(given, middle, self.caregiver_gives_obj_factor)
+            
+            self.logs_tools[i, :, :3] = world.tools[:, :3]
+            self.logs_tools[i, :, 3:5] = world.tool_ends
+            self.logs_tools[i, :, 5] = world.tools[:, 3]
+            self.logs_toys[i] = world.toys
+            
+            if self.arm.gui:
+                self.renderer.render_step(i)
+        
+        # x then y of the trajectories at 5 timesteps
+        steps = [0, 12, 24, 37, 49]
+        self.hand = np.concatenate((arm_traj[steps, 0], arm_traj[steps, 1]))
+        self.tools_traj = np.concatenate((self.logs_tools[steps, :, 0], self.logs_tools[steps, :, 1])).T
+        self.toys_traj = np.concatenate((self.logs_toys[steps, :, 0], self.logs_toys[steps, :, 1])).T
+        self.caregiver = [self.current_caregiver[0]] * 5 + [self.current_caregiver[1]] * 5
         
         
     def compute_sensori_effect(self, m):
@@ -362,83 +453,34 @@ class CogSci2017Environment(Environment):
             
         self.purge_logs()
         
-        arm_traj = self.arm.update(m_arm)
+        with metrics.span("env.arm"):
+            arm_traj = self.arm.update(m_arm)
         #print "arm traj", arm_traj
         
         if cmd == "diva":
-            diva_traj = self.diva.update(m_diva)
+            with metrics.span("env.diva"):
+                diva_traj = self.diva.update(m_diva)
             self.diva_traj = diva_traj
             self.produced_sound = self.analysis_sound(self.diva_traj)
             if self.produced_sound is not None:
                 self.count_produced_sounds[self.produced_sound] += 1
-                if self.produced_sound in self.human_sounds[:3]:                    
+                if self.produced_sound in self.human_sounds[:self.world.n_toys]:
                     self.count_parent_give_object += 1 
         else:
             diva_traj = np.zeros((50,2))
             self.produced_sound = None
         
-        
-        for i in range(self.timesteps):
-            
-            # Arm
-            arm_x, arm_y, arm_angle = arm_traj[i]
-            
-            # Tool
-            if not self.current_tool[3]:
-                if self.is_hand_free() and ((arm_x - self.current_tool[0]) ** 2. + (arm_y - self.current_tool[1]) ** 2. < self.handle_tol_sq):
-                    self.current_tool[0] = arm_x
-                    self.current_tool[1] = arm_y
-                    self.current_tool[2] = np.mod(arm_angle + self.handle_noise * np.random.randn() + 1, 2) - 1
-                    self.compute_tool()
-                    self.current_tool[3] = 1
-            else:
-                self.current_tool[0] = arm_x
-                self.current_tool[1] = arm_y
-                self.current_tool[2] = np.mod(arm_angle + self.handle_noise * np.random.randn() + 1, 2) - 1
-                self.compute_tool()
-            self.logs_tool.append([self.current_tool[:2], 
-                          self.current_tool[2], 
-                          self.tool_end_pos, 
-                          self.current_tool[3]])
-            
-            
-            if cmd == "arm":
-                # Toy 1
-                if self.current_toy1[2] == 1 or (self.is_hand_free() and ((arm_x - self.current_toy1[0]) ** 2 + (arm_y - self.current_toy1[1]) ** 2 < self.object_tol_hand_sq)):
-                    self.current_toy1[0] = arm_x
-                    self.current_toy1[1] = arm_y
-                    self.current_toy1[2] = 1
-                if self.current_toy1[2] == 2 or ((not self.current_toy1[2] == 1) and self.is_tool_free() and ((self.tool_end_pos[0] - self.current_toy1[0]) ** 2 + (self.tool_end_pos[1] - self.current_toy1[1]) ** 2 < self.object_tol_tool_sq)):
-                    self.current_toy1[0] = self.tool_end_pos[0]
-                    self.current_toy1[1] = self.tool_end_pos[1]
-                    self.current_toy1[2] = 2
-                self.logs_toy1.append([self.current_toy1])
-                
-                self.logs_caregiver.append([self.current_caregiver])     
-        
-            else:
-                # parent gives object if label is produced
-                if self.produced_sound == self.human_sounds[0]:
-                    self.current_toy1 =  self.caregiver_moves_obj(self.current_caregiver, self.current_toy1)        
-                
-                self.logs_toy1.append([self.current_toy1])
-                self.logs_caregiver.append([self.current_caregiver])
-                
-            if i in [0, 12, 24, 37, 49]:
-                self.hand = self.hand + [arm_x, arm_y]
-                self.tool = self.tool + self.current_tool[:2]
-                self.toy1 = self.toy1 + self.current_toy1[:2]
-                self.caregiver = self.caregiver + self.current_caregiver
-        
-            if self.arm.gui:
-                if i % 5 == 0:
-                    self.plot_step(self.ax, i)
+        with metrics.span("env.interaction"):
+            self.compute_interaction(arm_traj, cmd)
                     
+        if self.recorder is not None and self.recorder.is_recorded(self.t):
+            self.recorder.record(self.t, self.arm.logs, self.logs_tools, self.logs_toys, self.logs_caregiver)
                 
+        in_hand = np.flatnonzero(self.world.toys[:, 2] == 1)
         if cmd == "arm":
             # parent gives label if object is touched by hand 
-            if self.current_toy1[2] == 1:
-                label = self.give_label("toy1")
+            if len(in_hand) > 0:
+                label = self.give_label(in_hand[0])
             else:
                 label = self.give_label("random")
             self.sound = label
@@ -448,27 +490,17 @@ class CogSci2017Environment(Environment):
             self.sound = self.sound[0::2] + self.sound[1::2]
             
         
-        # Sort dims            
-        self.hand = self.hand[0::2] + self.hand[1::2]
-        self.tool = self.tool[0::2] + self.tool[1::2]
-        self.toy1 = self.toy1[0::2] + self.toy1[1::2]
-        self.caregiver = self.caregiver[0::2] + self.caregiver[1::2]
-        #self.sound = self.sound[0::2] + self.sound[1::2]
-        
-
         # Analysis
         if np.linalg.norm(m[21:]) > 0:
             self.count_diva += 1
         else:
             self.count_arm += 1
-        if self.current_tool[3]:
+        if self.world.tools[:, 3].any():
             self.count_tool += 1
-        if self.current_toy1[2] == 1:
-            self.count_toy1_by_hand += 1
-        elif self.current_tool[3] and self.current_toy1[2] == 2:
-            self.count_toy1_by_tool += 1
+        self.count_toys_by_hand[in_hand] += 1
+        self.count_toys_by_tool[self.world.toys_by_tool()] += 1
 
-        self.count_parent_give_label = self.count_toy1_by_hand
+        self.count_parent_give_label = int(self.count_toys_by_hand.sum())
 
         if cmd == "arm":
             self.time_arm += time.time() - t
@@ -479,10 +511,8 @@ class CogSci2017Environment(Environment):
             
         #print "previous context", len(self.current_context), self.current_context
         #print "s_hand", len(self.hand), self.hand
-        #print "s_tool", len(self.tool), self.tool
-        #print "s_toy1", len(self.toy1), self.toy1
-        #print "s_toy2", len(self.toy2), self.toy2
-        #print "s_toy3", len(self.toy3), self.toy3
+        #print "s_tools", self.tools_traj
+        #print "s_toys", self.toys_traj
         #print "s_sound", len(self.sound), self.sound
         #print "s_caregiver", len(self.caregiver), self.caregiver
         
@@ -493,20 +523,50 @@ class CogSci2017Environment(Environment):
             print "best_vocal_errors", [(hs,self.best_vocal_errors[hs]) for hs in self.human_sounds]
         
         
-        context = self.current_context
+        s = self.s_out if self.s_out is not None else np.empty(self.conf.s_ndims, dtype=self.dtype)
+        s[self.s_context] = self.current_context
+        s[self.s_hand] = self.hand
+        for j, s_tool in enumerate(self.s_tools):
+            s[s_tool] = self.tools_traj[j]
+        for k, s_toy in enumerate(self.s_toys):
+            s[s_toy] = self.toys_traj[k]
+        s[self.s_sound] = self.sound
+        s[self.s_caregiver] = self.caregiver
         
         # MAP TO STD INTERVAL
-        hand = [d/2 for d in self.hand]
-        tool = [d/2 for d in self.tool]
-        toy1 = [d/2 for d in self.toy1]
-        sound = [d - 8.5 for d in self.sound[:5]] + [d - 10.25 for d in self.sound[5:]]
-        caregiver = [d/2 for d in self.caregiver]
-        
-        s = context + hand + tool + toy1 + sound + caregiver
-        #print "s_sound", sound
-        return bounds_min_max(s, self.conf.s_mins, self.conf.s_maxs)
+        s[self.s_hand.start:self.s_sound.start] /= 2.
+        s[self.s_caregiver] /= 2.
+        s[self.s_sound.start:self.s_sound.start + 5] -= 8.5
+        s[self.s_sound.start + 5:self.s_sound.stop] -= 10.25
+        #print "s_sound", s[self.s_sound]
+        return np.clip(s, self.s_mins, self.s_maxs, out=s)
     
     
+    def replay(self, samples):
+        """ Accounts for samples simulated elsewhere (e.g. drawn from a bootstrap pool): m+s vectors,
+        optionally followed by the unnormalized formants of the sound (as analysis_formants takes them).
+        t and the arm/vocal counters are updated as compute_sensori_effect would, and with the
+        formants, the produced sounds and best vocal errors too (s has them normalized and clipped).
+        The world state and the tool/toy counters are not changed. """
+        samples = np.atleast_2d(samples)
+        m_ndims = self.conf.m_ndims
+        ndims = self.conf.ndims
+        formants = samples[:, ndims:ndims + 10] if samples.shape[1] >= ndims + 10 else None
+        for i, is_diva in enumerate(np.any(samples[:, 21:m_ndims] != 0., axis=1)):
+            if is_diva:
+                self.count_diva += 1
+                produced = self.analysis_formants(formants[i]) if formants is not None else None
+                if produced is not None:
+                    self.count_produced_sounds[produced] += 1
+                    if produced in self.human_sounds[:3]:
+                        self.count_parent_give_object += 1
+            else:
+                self.count_arm += 1
+            self.t += 1
+            if self.t % 100 == 0:
+                self.best_vocal_errors_evolution += [self.best_vocal_errors.copy()]
+        self.reset()
+
     def update(self, m_ag, reset=True, log=True):
         """ Computes sensorimotor values from motor orders.
 
@@ -539,10 +599,12 @@ class CogSci2017Environment(Environment):
         print "# Tool actions:", self.count_tool
         print "# toy sounds:", self.human_sounds[0], self.human_sounds[1], self.human_sounds[2]
         print "# Produced sounds:", self.count_produced_sounds
-        print "# Toy1 was reached by tool:", self.count_toy1_by_tool
-        print "# Toy1 was reached by hand:", self.count_toy1_by_hand
+        print "# Toys were reached by tool:", self.count_toys_by_tool.tolist()
+        print "# Toys were reached by hand:", self.count_toys_by_hand.tolist()
         print "# Parent gave vocal labels:", self.count_parent_give_label
         print "# Parent gave object:", self.count_parent_give_object
+        if hasattr(self.diva.synth, "recycles"):
+            print "# Octave recycles:", self.diva.synth.recycles, "in", self.diva.synth.recycle_time, "sec"
         print
 
     def init_plot(self):
@@ -555,20 +617,21 @@ class CogSci2017Environment(Environment):
         plt.draw()
     
     def plot_tool_step(self, ax, i, **kwargs_plot):
-        handle_pos = self.logs_tool[i][0]
-        end_pos = self.logs_tool[i][2]
-        
-        ax.plot([handle_pos[0], end_pos[0]], [handle_pos[1], end_pos[1]], '-', color=colors_config['stick'], lw=6, **kwargs_plot)
-        ax.plot(handle_pos[0], handle_pos[1], 'o', color = colors_config['gripper'], ms=12, **kwargs_plot)
-        ax.plot(end_pos[0], end_pos[1], 'o', color = colors_config['magnetic'], ms=12, **kwargs_plot)                    
+        for tool in self.logs_tools[i]:
+            handle_pos = tool[0:2]
+            end_pos = tool[3:5]
+            
+            ax.plot([handle_pos[0], end_pos[0]], [handle_pos[1], end_pos[1]], '-', color=colors_config['stick'], lw=6, **kwargs_plot)
+            ax.plot(handle_pos[0], handle_pos[1], 'o', color = colors_config['gripper'], ms=12, **kwargs_plot)
+            ax.plot(end_pos[0], end_pos[1], 'o', color = colors_config['magnetic'], ms=12, **kwargs_plot)                    
     
     def plot_toy1_step(self, ax, i, **kwargs_plot):
-        pos = self.logs_toy1[i][0]
-        rectangle = plt.Rectangle((pos[0] - 0.1, pos[1] - 0.1), 0.2, 0.2, color = colors[3], **kwargs_plot)
-        ax.add_patch(rectangle) 
+        for pos in self.logs_toys[i]:
+            rectangle = plt.Rectangle((pos[0] - 0.1, pos[1] - 0.1), 0.2, 0.2, color = colors[3], **kwargs_plot)
+            ax.add_patch(rectangle) 
         
     def plot_caregiver_step(self, ax, i, **kwargs_plot):
-        pos = self.logs_caregiver[i][0]
+        pos = self.logs_caregiver[i]
         rectangle = plt.Rectangle((pos[0] - 0.1, pos[1] - 0.1), 0.2, 0.2, color = "black", **kwargs_plot)
         ax.add_patch(rectangle) 
         
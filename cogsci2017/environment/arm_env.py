@@ -4,18 +4,20 @@ from explauto.utils import bounds_min_max
 from explauto.environment.environment import Environment
 from explauto.environment.simple_arm.simple_arm import joint_positions
 from ..dmp.mydmp import MyDMP
+from ..metrics import metrics
 
 
 class ArmEnvironment(Environment):
     use_process = True
 
     def __init__(self, m_mins, m_maxs, s_mins, s_maxs,
-                 lengths, angle_shift, rest_state, n_dmps=3, n_bfs=6, timesteps=50, gui=False):
+                 lengths, angle_shift, rest_state, n_dmps=3, n_bfs=6, timesteps=50, gui=False, dtype=np.float64):
         
         Environment.__init__(self, m_mins, m_maxs, s_mins, s_maxs)
 
-        self.lengths = lengths
-        self.angle_shift = angle_shift
+        self.dtype = np.dtype(dtype)
+        self.lengths = np.array(lengths, dtype=self.dtype)
+        self.angle_shift = self.dtype.type(angle_shift)
         self.rest_state = rest_state
         self.reset()
         self.gui = gui
@@ -24,8 +26,10 @@ class ArmEnvironment(Environment):
         self.n_dmps = n_dmps
         self.n_bfs = n_bfs
         self.timesteps = timesteps
-        self.max_params = np.array([300.] * self.n_bfs * self.n_dmps + [1.] * self.n_dmps)
-        self.motor_dmp = MyDMP(n_dmps=self.n_dmps, n_bfs=self.n_bfs, timesteps=self.timesteps, max_params=self.max_params)
+        self.max_params = np.array([300.] * self.n_bfs * self.n_dmps + [1.] * self.n_dmps, dtype=self.dtype)
+        self.motor_dmp = MyDMP(n_dmps=self.n_dmps, n_bfs=self.n_bfs, timesteps=self.timesteps, max_params=self.max_params, dtype=self.dtype)
+        self.traj_mins = np.array(self.n_dmps * [-1.], dtype=self.dtype)
+        self.traj_maxs = np.array(self.n_dmps * [1.], dtype=self.dtype)
         
         
     def reset(self):
@@ -36,17 +40,22 @@ class ArmEnvironment(Environment):
         return m
 
     def compute_traj(self, m):
-        return bounds_min_max(self.motor_dmp.trajectory(np.array(m) * self.max_params), self.n_dmps * [-1.], self.n_dmps * [1.])
+        return bounds_min_max(self.motor_dmp.trajectory(np.asarray(m, dtype=self.dtype) * self.max_params), self.traj_mins, self.traj_maxs)
         
     def compute_sensori_effect(self, m):
-        m_traj = self.compute_traj(m)
-        s = []
-        for m in m_traj:
-            a = self.angle_shift + np.cumsum(np.array(m))
+        with metrics.span("arm.dmp"):
+            m_traj = self.compute_traj(m)
+        with metrics.span("arm.kinematics"):
+            return self.compute_kinematics(m_traj)
+        
+    def compute_kinematics(self, m_traj):
+        s = np.zeros((len(m_traj), 3), dtype=self.dtype)
+        for i, m in enumerate(m_traj):
+            a = self.angle_shift + np.cumsum(m)
             a_pi = np.pi * a 
-            hand_pos = np.array([np.sum(np.cos(a_pi)*self.lengths), np.sum(np.sin(a_pi)*self.lengths)])
-            angle = np.mod(a[-1] + 1, 2) - 1
-            s.append([hand_pos[0], hand_pos[1], angle]) 
+            s[i, 0] = np.sum(np.cos(a_pi)*self.lengths)
+            s[i, 1] = np.sum(np.sin(a_pi)*self.lengths)
+            s[i, 2] = np.mod(a[-1] + 1, 2) - 1
             self.logs.append(m)
         return s
     
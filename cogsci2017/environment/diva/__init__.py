@@ -1,6 +1,6 @@
 # from config import environment, configurations, testcases
 from .diva import DivaEnvironment, DivaSynth
-from .config import default_config, vowel_config, low_config, full_config
+from .config import default_config, vowel_config, low_config, full_config, cogsci2017_config
 
 
 environment = DivaEnvironment
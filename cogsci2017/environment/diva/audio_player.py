@@ -0,0 +1,91 @@
+import threading
+import collections
+import numpy as np
+
+from ...metrics import metrics
+
+
+# Sonification of the vocal trajectories in the background of learning: play() only
+# queues the articulator trajectory, a worker thread renders the sounds with its own
+# synth (diva_synth in 'sound' mode, in another Octave session than the learner's),
+# and a callback-mode PyAudio stream plays them.
+# At most max_pending trajectories wait to be rendered: when the learner outpaces
+# playback, the oldest are dropped. The worker renders one sound ahead of playback.
+
+
+class AudioPlayer(object):
+    def __init__(self, make_synth, rate=11025, power=2., max_pending=2):
+        self.make_synth = make_synth
+        self.rate = rate
+        self.power = power
+        self.pending = collections.deque(maxlen=max_pending) # articulator trajectories to render
+        self.sounds = collections.deque() # rendered sounds, the first one being played
+        self.position = 0 # in the first sound
+        self.cond = threading.Condition()
+        self.running = True
+        self.n_dropped = 0
+        self.stream = None
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def open_stream(self):
+        import pyaudio
+        self.pa = pyaudio.PyAudio()
+        self.paContinue = pyaudio.paContinue
+        self.stream = self.pa.open(format=pyaudio.paFloat32,
+                                   channels=1,
+                                   rate=self.rate,
+                                   output=True,
+                                   stream_callback=self.callback)
+
+    def play(self, art_traj):
+        with self.cond:
+            if len(self.pending) == self.pending.maxlen:
+                self.n_dropped += 1
+                metrics.count("diva.audio.dropped")
+            self.pending.append(np.array(art_traj))
+            self.cond.notify_all()
+
+    def run(self):
+        synth = self.make_synth()
+        self.open_stream()
+        while True:
+            with self.cond:
+                while self.running and (len(self.pending) == 0 or len(self.sounds) > 1):
+                    self.cond.wait(0.1)
+                if not self.running:
+                    break
+                art_traj = self.pending.popleft()
+            with metrics.span("diva.audio.render"):
+                sound = (self.power * synth.sound_wave(art_traj)).astype(np.float32).ravel()
+            with self.cond:
+                self.sounds.append(sound)
+        synth.stop()
+
+    def callback(self, in_data, frame_count, time_info, status):
+        """ Next frame_count samples of the rendered sounds, completed with silence """
+        out = np.zeros(frame_count, dtype=np.float32)
+        i = 0
+        with self.cond:
+            while i < frame_count and self.sounds:
+                sound = self.sounds[0]
+                n = min(frame_count - i, len(sound) - self.position)
+                out[i:i + n] = sound[self.position:self.position + n]
+                i += n
+                self.position += n
+                if self.position == len(sound):
+                    self.sounds.popleft()
+                    self.position = 0
+                    self.cond.notify_all()
+        return out.tostring(), self.paContinue
+
+    def close(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.thread.join()
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.pa.terminate()
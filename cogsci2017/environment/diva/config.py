@@ -1,3 +1,4 @@
+import numpy as np
 from numpy import array
 from collections import namedtuple
 
@@ -26,3 +27,25 @@ default_config = make_diva_config(1., range(10), range(1, 4))  # Art1-Art10, F1-
 vowel_config = make_diva_config(1., range(7), range(1, 3))  # Art1-Art7, F1-F2
 low_config = make_diva_config(1., range(3), range(1, 3))
 full_config = make_diva_config(1., range(13), range(4))  # Art1-Art10-F-P-V, F0-F1-F2-F3
+
+
+def cogsci2017_config(audio=False, dtype=np.float64):
+    """ DivaEnvironment arguments of the vocal tract of CogSci2017Environment (Art1-Art7, F1-F2,
+    7 DMPs of 2 basis functions on 50 steps) """
+    return dict(
+                m_mins = np.array([-1, -1, -1, -1, -1, -1, -1]),
+                m_maxs = np.array([1, 1, 1, 1, 1, 1, 1]),
+                s_mins = np.array([ 7.5,  9.25]),
+                s_maxs = np.array([ 9.5 ,  11.25]),
+                m_used = range(7),
+                s_used = range(1, 3),
+                rest_position_diva = list([0]*7),
+                audio = audio,
+                diva_use_initial = True,
+                diva_use_goal = True,
+                used_diva = list([True]*7),
+                n_dmps_diva = 7,
+                n_bfs_diva = 2,
+                move_steps = 50,
+                dtype = dtype,
+                )
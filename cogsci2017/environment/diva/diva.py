@@ -1,40 +1,103 @@
 import os
 import numpy as np
 import time
+from collections import deque
 
-from numpy import array, hstack, float32, zeros, linspace, shape, mean, log2, transpose, sum, isnan
+from numpy import array, hstack, zeros, linspace, shape, mean, log2, transpose, sum, isnan
 
 from oct2py import Oct2Py, Oct2PyError
 from explauto.environment.environment import Environment
 from explauto.utils import bounds_min_max
 from explauto.models.dmp import DmpPrimitive
 from ...dmp.mydmp import MyDMP
-
-if not (os.environ.has_key('AVAKAS') and os.environ['AVAKAS']):
-    import pyaudio
+from ...metrics import metrics, clock
+from synth_server import SynthClient
+from octave_pipe import OctavePipe, OctavePipeError
+from audio_player import AudioPlayer
 
                        
                        
+def octave_pid(octave):
+    """ pid of the Octave process of an OctavePipe or Oct2Py session (None if not found) """
+    if hasattr(octave, "pid"):
+        return octave.pid
+    for attrs in [["_engine", "repl", "child", "pid"], ["_session", "proc", "pid"]]:
+        obj = octave
+        try:
+            for attr in attrs:
+                obj = getattr(obj, attr)
+            return obj
+        except AttributeError:
+            pass
+    return None
+
+
+def rss_mb(pid):
+    """ Resident memory of process pid in MB (None if unknown) """
+    try:
+        with open('/proc/{}/status'.format(pid)) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.
+    except (IOError, TypeError):
+        pass
+    return None
+
+
 class DivaSynth:
-    def __init__(self, sample_rate=11025):
+    """
+    transport: 'oct2py', or 'pipe' for an OctavePipe (binary transport, falls back to
+    Oct2Py if Octave cannot be started this way), default from DIVA_TRANSPORT
+    
+    Octave is recycled (restarted) when, checked every check_every calls:
+    - the median synthesis time per articulator column of the last window calls is
+    above max_latency_ratio times its value in the first window calls after a restart,
+    - or its resident memory is above max_rss_mb,
+    - or in any case after max_iter calls.
+    Recycles are counted by reason in self.recycles and timed in self.recycle_time,
+    and reported to metrics (diva.recycle.<reason> counts and diva.recycle durations).
+    """
+    def __init__(self, sample_rate=11025, transport=None, max_latency_ratio=2., max_rss_mb=1000., max_iter=5000, window=50, check_every=50):
         # sample rate setting not working yet
         self.diva_path = os.path.join(os.getenv("HOME"), 'software/DIVAsimulink/')
         assert os.path.exists(self.diva_path)
-        self.octave = Oct2Py()
-        self.restart_iter = 500
+        self.transport = transport or os.environ.get('DIVA_TRANSPORT', 'oct2py')
+        self.max_latency_ratio = max_latency_ratio
+        self.max_rss_mb = max_rss_mb
+        self.max_iter = max_iter
+        self.check_every = check_every
+        self.latencies = deque(maxlen=window)
+        self.recycles = {}
+        self.recycle_time = 0.
+        self.octave = self.new_octave()
         self.init_oct()
+        
+    def new_octave(self):
+        if self.transport == 'pipe':
+            try:
+                return OctavePipe(self.diva_path)
+            except (OSError, OctavePipeError) as e:
+                print "Warning: Octave pipe transport failed (" + str(e) + "), using Oct2Py"
+                self.transport = 'oct2py'
+        return Oct2Py()
 
     def init_oct(self):
         self.octave.addpath(self.diva_path)
         self.iter = 0
+        self.latencies.clear()
+        self.baseline_latency = None
         
     def execute(self, art):
-        try:
-            self.aud = self.octave.diva_synth(art, 'audsom')
-        except:
-            self.reboot()
-            print "Warning: Oct2Py crashed, Oct2Py restarted"
-            self.aud = self.octave.diva_synth(art, 'audsom')
+        with metrics.span("diva.synth"):
+            t0 = clock()
+            try:
+                self.aud = self.octave.diva_synth(art, 'audsom')
+            except Exception as e:
+                print "Warning: Octave crashed (" + repr(e) + "), Octave restarted"
+                self.recycle("crash")
+                self.aud = self.octave.diva_synth(art, 'audsom')
+            else:
+                self.latencies.append((clock() - t0) / np.shape(art)[-1])
         self.add_iter()
         return self.aud,
 
@@ -44,13 +107,54 @@ class DivaSynth:
         return wave
     
     def add_iter(self):
-        if self.iter >= self.restart_iter:
-            self.restart()
+        self.iter += 1
+        if self.iter >= self.max_iter:
+            self.recycle("max_iter")
+        elif self.iter % self.check_every == 0:
+            reason = self.recycle_reason()
+            if reason is not None:
+                self.recycle(reason)
+                
+    def recycle_reason(self):
+        if len(self.latencies) == self.latencies.maxlen:
+            latency = np.median(self.latencies)
+            if self.baseline_latency is None:
+                self.baseline_latency = latency
+            elif latency > self.max_latency_ratio * self.baseline_latency:
+                return "latency"
+        if self.max_rss_mb is not None:
+            rss = rss_mb(octave_pid(self.octave))
+            if rss is not None and rss > self.max_rss_mb:
+                return "memory"
+        return None
+    
+    def recycle(self, reason):
+        t0 = clock()
+        if reason == "crash":
+            self.reboot()
         else:
-            self.iter += 1
+            self.restart()
+        duration = clock() - t0
+        self.recycles[reason] = self.recycles.get(reason, 0) + 1
+        self.recycle_time += duration
+        metrics.count("diva.recycle." + reason)
+        metrics.observe("diva.recycle", duration)
             
     def reboot(self):
-        self.octave = Oct2Py()
+        """ New Octave session after a crash: the old one is exited (its process and, with
+        the pipe transport, its temporary directory) as far as it still can be """
+        try:
+            self.octave.exit()
+        except Exception:
+            pass
+        self.octave = self.new_octave()
+        self.init_oct()
+        
+    def detach(self):
+        """ New Octave session in a forked process: the parent's session is kept referenced
+        (not exited when collected), as it is still used by the parent """
+        self.parent_octave = self.octave
+        self.octave = self.new_octave()
         self.init_oct()
         
     def restart(self):
@@ -73,7 +177,9 @@ class DivaEnvironment(Environment):
                 used_diva,
                 n_dmps_diva,
                 n_bfs_diva,
-                move_steps):
+                move_steps,
+                dtype=np.float64,
+                synth_address=None):
         
         self.m_mins = m_mins
         self.m_maxs = m_maxs 
@@ -89,6 +195,7 @@ class DivaEnvironment(Environment):
         self.n_dmps_diva = n_dmps_diva
         self.n_bfs_diva = n_bfs_diva
         self.move_steps = move_steps
+        self.dtype = np.dtype(dtype)
     
         self.f0 = 1.
         self.pressure = 1.
@@ -97,14 +204,13 @@ class DivaEnvironment(Environment):
         if (os.environ.has_key('AVAKAS') and os.environ['AVAKAS']):
             self.audio = False
         
-        if self.audio:            
-            self.pa = pyaudio.PyAudio()
-            self.stream = self.pa.open(format=pyaudio.paFloat32,
-                                        channels=1,
-                                        rate=11025,
-                                        output=True)
-            
-        self.synth = DivaSynth()
+        # synthesis by a node-local SynthServer if an address is given (or in DIVA_SYNTH_SERVER)
+        synth_address = synth_address or os.environ.get('DIVA_SYNTH_SERVER')
+        self.synth = SynthClient(synth_address) if synth_address else DivaSynth()
+        
+        if self.audio:
+            # sounds rendered and played in the background, with another synth
+            self.player = AudioPlayer(lambda: SynthClient(synth_address) if synth_address else DivaSynth())
         self.art = array([0.]*10 + [self.f0, self.pressure, self.voicing])   # 13 articulators is a constant from diva_synth.m in the diva source code
         
         self.max_params = []
@@ -114,9 +220,9 @@ class DivaEnvironment(Environment):
             self.max_params = self.max_params + [300.] * self.n_bfs_diva * self.n_dmps_diva
         if self.diva_use_goal:
             self.max_params = self.max_params + [1.] * self.n_dmps_diva
-        self.max_params = np.array(self.max_params)
+        self.max_params = np.array(self.max_params, dtype=self.dtype)
         
-        self.dmp = MyDMP(n_dmps=self.n_dmps_diva, n_bfs=self.n_bfs_diva, timesteps=self.move_steps, use_init=self.diva_use_initial, max_params=self.max_params)
+        self.dmp = MyDMP(n_dmps=self.n_dmps_diva, n_bfs=self.n_bfs_diva, timesteps=self.move_steps, use_init=self.diva_use_initial, max_params=self.max_params, dtype=self.dtype)
         
         self.default_m = zeros(self.n_dmps_diva * self.n_bfs_diva + self.n_dmps_diva * self.diva_use_initial + self.n_dmps_diva * self.diva_use_goal)
         self.default_m_traj = self.compute_motor_command(self.default_m)
@@ -149,12 +255,7 @@ class DivaEnvironment(Environment):
             if self.default_formants is not None and (m_env == self.default_m_traj).all():
                 return self.default_formants
             else:
-                self.art_traj = zeros((13, array(m_env).shape[0]))
-                #self.art_traj = zeros((13, array(m_env).shape[0]))
-                self.art_traj[10, :] = self.f0
-                self.art_traj[11, :] = self.pressure
-                self.art_traj[12, :] = self.voicing
-                self.art_traj[self.m_used,:] = transpose(m_env)
+                self.art_traj = self.art_trajectory(m_env)
                 
                 res = self.synth.execute(2.*(self.art_traj))[0]
                 
@@ -166,11 +267,20 @@ class DivaEnvironment(Environment):
     #                 print "self.art_traj", self.art_traj, 
     #                 print "res", res, 
     #                 print "formants", log2(transpose(res[self.s_used,:]))
-                formants = log2(transpose(res[self.s_used,:]))
+                formants = log2(transpose(res[self.s_used,:])).astype(self.dtype)
                 formants[isnan(formants)] = 0.
                 
                 return formants
 
+    def art_trajectory(self, m_env):
+        """ Articulators (13 x timesteps) of a motor trajectory """
+        art_traj = zeros((13, array(m_env).shape[0]))
+        art_traj[10, :] = self.f0
+        art_traj[11, :] = self.pressure
+        art_traj[12, :] = self.voicing
+        art_traj[self.m_used,:] = transpose(m_env)
+        return art_traj
+
     def rest_params(self):
         dims = self.n_dmps_diva*self.n_bfs_diva
         if self.diva_use_initial:
@@ -186,7 +296,7 @@ class DivaEnvironment(Environment):
     
     
     def trajectory(self, m):
-        y = self.dmp.trajectory(np.array(m) * self.max_params)
+        y = self.dmp.trajectory(np.asarray(m, dtype=self.dtype) * self.max_params)
         if len(y) > self.move_steps: 
             ls = linspace(0,len(y)-1,self.move_steps)
             ls = array(ls, dtype='int')
@@ -199,8 +309,7 @@ class DivaEnvironment(Environment):
         s = Environment.update(self, mov)
         
         if self.audio and audio:
-            sound = self.sound_wave(self.art_traj)
-            self.stream.write(sound.astype(float32).tostring())
+            self.player.play(self.art_traj)
             #time.sleep(1)
             #print "Sound sent", sound, len(sound)
         return s    
@@ -0,0 +1,134 @@
+import os
+import time
+import fcntl
+import errno
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+
+
+# Binary transport to a long-lived Octave process running diva_synth, replacing Oct2Py's
+# temporary MAT files: requests and results go through two named pipes as raw float64
+# matrices (column-major, as Octave stores them) after a header of 3 int32:
+#   request: mode (0: 'audsom', 1: 'sound', -1: exit), rows, cols
+#   result:  status (0: ok, 1: error), rows, cols
+# OctavePipe has the subset of the Oct2Py interface used by DivaSynth.
+
+
+modes = dict(audsom=0, sound=1)
+
+server_script = """
+addpath('{path}');
+fin = fopen('{request}', 'r');
+fout = fopen('{result}', 'w');
+while true
+  h = fread(fin, 3, 'int32');
+  if numel(h) < 3 || h(1) < 0
+    break;
+  end
+  art = reshape(fread(fin, h(2) * h(3), 'double'), h(2), h(3));
+  try
+    if h(1) == 0
+      r = double(diva_synth(art, 'audsom'));
+    else
+      r = double(diva_synth(art, 'sound'));
+    end
+    fwrite(fout, [0, size(r, 1), size(r, 2)], 'int32');
+    fwrite(fout, r, 'double');
+  catch
+    fwrite(fout, [1, 0, 0], 'int32');
+  end
+  fflush(fout);
+end
+fclose(fin);
+fclose(fout);
+"""
+
+
+class OctavePipeError(Exception):
+    pass
+
+
+class OctavePipe(object):
+    def __init__(self, path, executable=None):
+        self.path = path
+        self.executable = executable or os.environ.get('OCTAVE_EXECUTABLE', 'octave-cli')
+        self.start()
+
+    def start(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='diva-pipe-')
+        request, result = os.path.join(self.tmp_dir, 'request'), os.path.join(self.tmp_dir, 'result')
+        os.mkfifo(request)
+        os.mkfifo(result)
+        script = server_script.format(path=self.path, request=request, result=result)
+        self.process = subprocess.Popen([self.executable, '--no-gui', '--quiet', '--norc', '--eval', script],
+                                        stdin=open(os.devnull), stdout=open(os.devnull, 'w'))
+        # same opening order as the script (opening a named pipe blocks until the other end is opened)
+        self.fin = os.fdopen(self.open_request(request), 'wb')
+        self.fout = open(result, 'rb')
+        self.header = np.zeros(3, dtype=np.int32)
+
+    def open_request(self, request, timeout=60.):
+        """ Wait for Octave to open the request pipe, unless it exits before """
+        t0 = time.time()
+        while True:
+            try:
+                fd = os.open(request, os.O_WRONLY | os.O_NONBLOCK)
+                break
+            except OSError as e:
+                if e.errno != errno.ENXIO:
+                    raise
+                if self.process.poll() is not None or time.time() - t0 > timeout:
+                    if self.process.poll() is None:
+                        self.process.kill()
+                    shutil.rmtree(self.tmp_dir, True)
+                    raise OctavePipeError("Octave did not start")
+                time.sleep(0.01)
+        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) & ~os.O_NONBLOCK)
+        return fd
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def addpath(self, path):
+        if path != self.path:
+            raise NotImplementedError("OctavePipe is started with the diva path only")
+
+    def read(self, n):
+        data = self.fout.read(n)
+        if len(data) < n:
+            raise OctavePipeError("Octave exited (return code {})".format(self.process.poll()))
+        return data
+
+    def diva_synth(self, art, mode='audsom'):
+        art = np.asarray(art, dtype=np.float64)
+        if art.ndim == 1:
+            art = art.reshape((-1, 1))
+        self.header[:] = modes[mode], art.shape[0], art.shape[1]
+        try:
+            self.fin.write(self.header.tobytes())
+            self.fin.write(art.tobytes(order='F'))
+            self.fin.flush()
+        except IOError as e:
+            raise OctavePipeError(str(e))
+        status, rows, cols = np.frombuffer(self.read(12), dtype=np.int32)
+        if status != 0:
+            raise OctavePipeError("diva_synth failed")
+        return np.frombuffer(self.read(8 * rows * cols), dtype=np.float64).reshape((rows, cols), order='F')
+
+    def exit(self):
+        try:
+            self.header[:] = -1, 0, 0
+            self.fin.write(self.header.tobytes())
+            self.fin.close()
+            self.fout.close()
+            self.process.wait()
+        except IOError:
+            self.process.kill()
+        shutil.rmtree(self.tmp_dir, True)
+
+    def restart(self):
+        self.exit()
+        self.start()
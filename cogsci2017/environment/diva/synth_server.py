@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+import Queue
+import numpy as np
+from multiprocessing.connection import Listener, Client
+
+from ...metrics import metrics
+
+
+# Node-local DIVA synthesis service: one server owns a few synth backends (each with
+# its own Octave session) and serves the trials running on the node, through
+# SynthClient, a DivaSynth-compatible proxy (DivaEnvironment uses it when the
+# DIVA_SYNTH_SERVER environment variable gives the address of a server).
+#
+# diva_synth in 'audsom' mode synthesizes each column (time step) of the articulator
+# matrix independently, so concurrent 'audsom' requests of different clients are
+# coalesced into one call on their concatenated columns, and the result split back.
+
+
+class SynthServer(object):
+    def __init__(self, address, n_backends=1, max_batch=16, coalesce_wait=0.0005, make_backend=None):
+        if make_backend is None:
+            from diva import DivaSynth
+            make_backend = DivaSynth
+        self.address = address
+        self.max_batch = max_batch
+        self.coalesce_wait = coalesce_wait
+        self.requests = Queue.Queue()
+        self.backends = [make_backend() for _ in range(n_backends)]
+        self.n_calls = 0
+        self.n_requests = 0
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        listener = Listener(self.address, family='AF_UNIX')
+        for backend in self.backends:
+            thread = threading.Thread(target=self.run_backend, args=(backend,))
+            thread.daemon = True
+            thread.start()
+        try:
+            while True:
+                conn = listener.accept()
+                thread = threading.Thread(target=self.serve_client, args=(conn,))
+                thread.daemon = True
+                thread.start()
+        finally:
+            listener.close()
+
+    def serve_client(self, conn):
+        """ Requests of one client: (mode, art), answered in order on the connection """
+        done = threading.Event()
+        reply = []
+        try:
+            while True:
+                mode, art = conn.recv()
+                done.clear()
+                self.requests.put((mode, np.asarray(art, dtype=np.float64), reply, done))
+                done.wait()
+                conn.send(reply.pop())
+        except (EOFError, IOError):
+            conn.close()
+
+    def next_batch(self):
+        batch = [self.requests.get()]
+        if batch[0][0] != 'audsom':
+            return batch
+        deadline = time.time() + self.coalesce_wait
+        while len(batch) < self.max_batch:
+            try:
+                request = self.requests.get(timeout=max(deadline - time.time(), 0.))
+            except Queue.Empty:
+                break
+            if request[0] != 'audsom':
+                # served alone, in a next batch
+                self.requests.put(request)
+                break
+            batch.append(request)
+        return batch
+
+    def run_backend(self, backend):
+        while True:
+            batch = self.next_batch()
+            try:
+                if batch[0][0] == 'audsom':
+                    results = self.synth_batch(backend, [art for _, art, _, _ in batch])
+                else:
+                    results = [backend.sound_wave(batch[0][1])]
+                results = [('ok', result) for result in results]
+            except Exception as e:
+                results = [('error', repr(e))] * len(batch)
+            self.n_calls += 1
+            self.n_requests += len(batch)
+            metrics.count("diva.server.calls")
+            metrics.count("diva.server.requests", len(batch))
+            for (_, _, reply, done), result in zip(batch, results):
+                reply.append(result)
+                done.set()
+
+    def synth_batch(self, backend, arts):
+        if len(arts) == 1:
+            return [backend.execute(arts[0])[0]]
+        aud = backend.execute(np.hstack(arts))[0]
+        bounds = np.cumsum([0] + [art.shape[1] for art in arts])
+        return [aud[:, bounds[i]:bounds[i + 1]] for i in range(len(arts))]
+
+
+class SynthClient(object):
+    """ DivaSynth proxy to a SynthServer """
+    def __init__(self, address):
+        self.address = address
+        self.conn = Client(address, family='AF_UNIX')
+
+    def call(self, mode, art):
+        with metrics.span("diva.synth"):
+            self.conn.send((mode, np.asarray(art, dtype=np.float64)))
+            status, result = self.conn.recv()
+        if status != 'ok':
+            raise RuntimeError("DIVA synthesis server: " + result)
+        return result
+
+    def execute(self, art):
+        self.aud = self.call('audsom', art)
+        return self.aud,
+
+    def sound_wave(self, art):
+        return self.call('sound', art)
+
+    def detach(self):
+        """ New connection in a forked process """
+        self.conn = Client(self.address, family='AF_UNIX')
+
+    def stop(self):
+        self.conn.close()
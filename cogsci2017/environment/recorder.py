@@ -0,0 +1,67 @@
+import os
+import numpy as np
+
+
+def episode_dtype(timesteps=50, n_joints=3):
+    return np.dtype([('episode', np.int64),
+                     ('arm', np.float32, (timesteps, n_joints)),         # joint angles
+                     ('tool', np.float32, (timesteps, 6)),               # handle x, y, angle, end x, y, held
+                     ('toy1', np.float32, (timesteps, 3)),               # x, y, state
+                     ('caregiver', np.float32, (timesteps, 2))])         # x, y
+
+
+class EpisodeRecorder(object):
+    """
+    Record the world state of selected episodes of CogSci2017Environment.
+
+    Episodes are written into a fixed-size ring of n_episodes records stored in a
+    memory-mapped .npy file with a structured dtype, so that the oldest episodes
+    are overwritten and the file never grows. Empty records have episode == -1.
+
+    """
+    def __init__(self, filename, n_episodes=1000, record_every=100, timesteps=50, n_joints=3):
+        self.filename = filename
+        self.n_episodes = n_episodes
+        self.record_every = record_every
+        self.timesteps = timesteps
+        self.n_joints = n_joints
+        self.dtype = episode_dtype(timesteps, n_joints)
+
+        if os.path.exists(filename):
+            self.data = np.lib.format.open_memmap(filename, mode='r+')
+            assert self.data.dtype == self.dtype and len(self.data) == n_episodes, "Incompatible recorder file " + filename
+            recorded = self.data['episode'] >= 0
+            self.count = int(np.sum(recorded))
+            if self.count == self.n_episodes:
+                self.count = int(np.argmin(self.data['episode'])) + self.n_episodes
+        else:
+            self.data = np.lib.format.open_memmap(filename, mode='w+', dtype=self.dtype, shape=(n_episodes,))
+            self.data['episode'] = -1
+            self.count = 0
+
+    def is_recorded(self, episode):
+        return episode % self.record_every == 0
+
+    def record(self, episode, arm_logs, logs_tools, logs_toys, logs_caregiver):
+        """ logs_tools (timesteps, n_tools, 6), logs_toys (timesteps, n_toys, 3): the first tool and toy are recorded """
+        rec = self.data[self.count % self.n_episodes]
+        rec['episode'] = episode
+        rec['arm'] = arm_logs
+        rec['tool'] = logs_tools[:, 0]
+        rec['toy1'] = logs_toys[:, 0]
+        rec['caregiver'] = logs_caregiver
+        self.count += 1
+
+    def flush(self):
+        self.data.flush()
+
+    def close(self):
+        self.flush()
+        del self.data
+
+
+def load_episodes(filename):
+    """ Return the recorded episodes of a recorder file, sorted by episode """
+    data = np.load(filename, mmap_mode='r')
+    data = data[data['episode'] >= 0]
+    return data[np.argsort(data['episode'])]
@@ -0,0 +1,111 @@
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+
+from explauto.environment.simple_arm.simple_arm import joint_positions
+
+
+class WorldView(object):
+    """
+    Figure of the arm, tool, toy and caregiver.
+
+    Artists are created once and updated with set_state. In animated mode,
+    only the artists are redrawn over a cached background (blitting),
+    otherwise they are drawn with the figure (e.g. by savefig).
+
+    """
+    def __init__(self, lengths, angle_shift, colors_config, toy_color, animated=True):
+
+        self.lengths = lengths
+        self.angle_shift = angle_shift
+
+        self.fig, self.ax = plt.subplots()
+        self.fig.set_size_inches(6., 6., forward=True)
+        self.ax.set_aspect('equal')
+        self.ax.set_xlim([-2, 2])
+        self.ax.set_ylim([-2, 2])
+        self.ax.xaxis.set_major_locator(plt.NullLocator())
+        self.ax.yaxis.set_major_locator(plt.NullLocator())
+
+        n_joints = len(self.lengths)
+        self.arm_line, = self.ax.plot(np.zeros(n_joints + 1), np.zeros(n_joints + 1), '-o', color='grey', lw=4, ms=10, animated=animated)
+        self.hand, = self.ax.plot([0.], [0.], 'o', color='r', ms=14, markerfacecolor='white', markeredgewidth=4, markeredgecolor="r", animated=animated)
+        self.tool_line, = self.ax.plot([0., 0.], [0., 0.], '-', color=colors_config['stick'], lw=6, animated=animated)
+        self.tool_handle, = self.ax.plot([0.], [0.], 'o', color=colors_config['gripper'], ms=12, animated=animated)
+        self.tool_end, = self.ax.plot([0.], [0.], 'o', color=colors_config['magnetic'], ms=12, animated=animated)
+        self.toy1 = plt.Rectangle((0., 0.), 0.2, 0.2, color=toy_color, animated=animated)
+        self.caregiver = plt.Rectangle((0., 0.), 0.2, 0.2, color="black", animated=animated)
+        self.ax.add_patch(self.toy1)
+        self.ax.add_patch(self.caregiver)
+        self.artists = [self.tool_line, self.tool_handle, self.tool_end, self.toy1, self.caregiver, self.arm_line, self.hand]
+
+        self.background = None
+        self.fig.canvas.mpl_connect('draw_event', self.on_draw)
+        if animated:
+            plt.show(block=False)
+        self.fig.canvas.draw()
+
+    def on_draw(self, event):
+        # The background has to be captured again after each full redraw (e.g. window resize)
+        self.background = self.fig.canvas.copy_from_bbox(self.ax.bbox)
+
+    def set_state(self, angles, handle_pos, end_pos, toy1_pos, caregiver_pos):
+        angles = np.array(angles, dtype=np.float64)
+        angles[0] += self.angle_shift
+        x, y = joint_positions(angles, self.lengths, 'std')
+        self.arm_line.set_data(np.hstack((0., x)), np.hstack((0., y)))
+        self.hand.set_data([x[-1]], [y[-1]])
+        self.tool_line.set_data([handle_pos[0], end_pos[0]], [handle_pos[1], end_pos[1]])
+        self.tool_handle.set_data([handle_pos[0]], [handle_pos[1]])
+        self.tool_end.set_data([end_pos[0]], [end_pos[1]])
+        self.toy1.set_xy((toy1_pos[0] - 0.1, toy1_pos[1] - 0.1))
+        self.caregiver.set_xy((caregiver_pos[0] - 0.1, caregiver_pos[1] - 0.1))
+
+    def blit(self):
+        canvas = self.fig.canvas
+        if self.background is None:
+            canvas.draw()
+        canvas.restore_region(self.background)
+        for artist in self.artists:
+            self.ax.draw_artist(artist)
+        canvas.blit(self.ax.bbox)
+        canvas.flush_events()
+
+    def close(self):
+        plt.close(self.fig)
+
+
+class EnvironmentRenderer(WorldView):
+    """
+    Live renderer of CogSci2017Environment episodes.
+
+    Frames are dropped when they come faster than max_fps, and only one
+    episode every render_every is shown.
+
+    """
+    def __init__(self, environment, max_fps=25., render_every=1, step_every=5, colors_config=None, toy_color=None):
+
+        self.environment = environment
+        self.max_fps = max_fps
+        self.render_every = render_every
+        self.step_every = step_every
+        self.last_frame = 0.
+        WorldView.__init__(self, environment.arm.lengths, environment.arm.angle_shift, colors_config, toy_color)
+
+    def is_rendered_episode(self):
+        return self.environment.t % self.render_every == 0
+
+    def render_step(self, i):
+        if i % self.step_every != 0 or not self.is_rendered_episode():
+            return
+        now = time.time()
+        if now - self.last_frame < 1. / self.max_fps:
+            return
+        self.last_frame = now
+        env = self.environment
+        self.set_state(env.arm.logs[i], 
+                       env.logs_tools[i, 0, 0:2], 
+                       env.logs_tools[i, 0, 3:5], 
+                       env.logs_toys[i, 0], 
+                       env.logs_caregiver[i])
+        self.blit()
@@ -0,0 +1,110 @@
+import collections
+import numpy as np
+
+
+def sensory_layout(n_tools=1, n_toys=1, n_points=5):
+    """ Slices of the sensory vector of CogSci2017Environment: context (positions of the tools,
+    toys and caregiver), then trajectories (n_points x, then n_points y) of the hand, each tool
+    (tool1, tool2...), each toy (toy1, toy2...), the sound (formants) and the caregiver """
+    sizes = [("context", 2 * (n_tools + n_toys + 1)), ("hand", 2 * n_points)]
+    sizes += [("tool{}".format(j + 1), 2 * n_points) for j in range(n_tools)]
+    sizes += [("toy{}".format(k + 1), 2 * n_points) for k in range(n_toys)]
+    sizes += [("sound", 2 * n_points), ("caregiver", 2 * n_points)]
+    layout = collections.OrderedDict()
+    start = 0
+    for name, size in sizes:
+        layout[name] = slice(start, start + size)
+        start += size
+    return layout
+
+
+class WorldModel(object):
+    """
+    Tools and toys of CogSci2017Environment, as arrays:
+    - tools (n_tools, 4): handle x, y, angle, held (1 if in the hand), and tool_ends (n_tools, 2)
+    - toys (n_toys, 3): x, y, state (0: free, 1: in the hand, 2 + j: at the end of tool j)
+
+    At each timestep, the hand and the tool ends are tested against all the objects at once.
+    The hand holds at most one object, and each tool end at most one toy: when several are
+    in reach, the first one is taken.
+
+    """
+    def __init__(self, n_tools=1, n_toys=1, tool_length=0.5, handle_tol=0.2, handle_noise=0., object_tol_hand=0.2, object_tol_tool=0.2):
+        self.n_tools = n_tools
+        self.n_toys = n_toys
+        self.tool_length = tool_length
+        self.handle_tol_sq = handle_tol * handle_tol
+        self.handle_noise = handle_noise
+        self.object_tol_hand_sq = object_tol_hand * object_tol_hand
+        self.object_tol_tool_sq = object_tol_tool * object_tol_tool
+        self.tools = np.zeros((n_tools, 4))
+        self.tool_ends = np.zeros((n_tools, 2))
+        self.toys = np.zeros((n_toys, 3))
+
+    def positions(self):
+        """ x, y of the tool handles then of the toys """
+        return np.concatenate((self.tools[:, :2].ravel(), self.toys[:, :2].ravel()))
+
+    def compute_tool_ends(self):
+        a = np.pi * self.tools[:, 2]
+        self.tool_ends[:, 0] = self.tools[:, 0] + np.cos(a) * self.tool_length
+        self.tool_ends[:, 1] = self.tools[:, 1] + np.sin(a) * self.tool_length
+
+    def release(self):
+        """ Nothing held by the hand nor by the tools """
+        self.tools[:, 3] = 0.
+        self.toys[:, 2] = 0.
+
+    def is_hand_free(self):
+        return not (self.tools[:, 3].any() or (self.toys[:, 2] == 1).any())
+
+    def toys_by_tool(self):
+        """ Toys at the end of a tool in the hand """
+        state = self.toys[:, 2]
+        if self.n_tools == 0:
+            return np.zeros(self.n_toys, dtype=bool)
+        return (state >= 2) & (self.tools[np.maximum(state - 2, 0).astype(int), 3] == 1)
+
+    def move_tools(self, x, y, angle, rng):
+        """ The tool in the hand follows it, else the free hand takes the first tool whose handle is in reach """
+        held = np.flatnonzero(self.tools[:, 3])
+        if len(held) == 0:
+            if not self.is_hand_free():
+                return
+            reach = (x - self.tools[:, 0]) ** 2. + (y - self.tools[:, 1]) ** 2. < self.handle_tol_sq
+            held = np.flatnonzero(reach)
+            if len(held) == 0:
+                return
+        j = held[0]
+        self.tools[j, 0] = x
+        self.tools[j, 1] = y
+        self.tools[j, 2] = np.mod(angle + self.handle_noise * rng.randn() + 1, 2) - 1
+        self.tools[j, 3] = 1
+        self.compute_tool_ends()
+
+    def move_toys(self, x, y):
+        """ The toys in the hand or at the end of a tool follow them, else the free hand and the
+        free tool ends take the first free toy in reach """
+        state = self.toys[:, 2]
+        if self.is_hand_free():
+            reach = (x - self.toys[:, 0]) ** 2 + (y - self.toys[:, 1]) ** 2 < self.object_tol_hand_sq
+            state[np.flatnonzero(reach)[:1]] = 1
+        in_hand = state == 1
+        self.toys[in_hand, 0] = x
+        self.toys[in_hand, 1] = y
+
+        if self.n_tools == 0:
+            return
+        reach = ((self.tool_ends[np.newaxis, :, 0] - self.toys[:, np.newaxis, 0]) ** 2
+                 + (self.tool_ends[np.newaxis, :, 1] - self.toys[:, np.newaxis, 1]) ** 2 < self.object_tol_tool_sq)
+        reach[state != 0] = False
+        for j in np.flatnonzero(reach.any(axis=0)):
+            if not (state == 2 + j).any():
+                k = np.flatnonzero(reach[:, j])[:1]
+                state[k] = 2 + j
+                reach[k] = False
+        on_tool = state >= 2
+        self.toys[on_tool, :2] = self.tool_ends[state[on_tool].astype(int) - 2]
+
+    def move_toy_toward(self, k, pos, factor):
+        self.toys[k, :2] += factor * (np.asarray(pos) - self.toys[k, :2])
@@ -0,0 +1,250 @@
+import os
+import sys
+import cPickle
+import traceback
+import collections
+import multiprocessing
+import numpy as np
+
+from .metrics import metrics
+
+
+# Competence evaluation: reach toy1 goals at random positions in regions 1 (r < 1),
+# 2 (1 < r < 1.5) and 3 (1.5 < r < 2), with the arm module or the vocal module
+# whose dataset has the nearest sensory point to the goal.
+# Goals are drawn once, so that successive evaluations of a run are comparable, and
+# rollouts are simulated from snapshots of the environment (CogSci2017Environment.simulate),
+# so that evaluating does not change the environment nor its statistics.
+#
+# Every goal starts from the same snapshot: same caregiver and tool pose, nothing held,
+# only toy1 moved to the goal position. The evaluation loop of run.py before (version 1)
+# ran the goals in sequence in the live environment: each goal drew a new caregiver and
+# started from the tool pose left by the previous goal. The competence errors, tool and
+# vocal uses of the two versions are not comparable: the version is recorded in the
+# results and in the run.py logs (eval_version, missing in version 1 logs).
+
+
+version = 2
+
+
+def rand2d(region, n, rng=np.random):
+    """ n positions drawn as CogSci2017Environment.reset_rand2d(region) """
+    r_min, r_width = {1: (0., 1.), 2: (1., 0.5), 3: (1.5, 0.5)}[region]
+    alpha = 2. * np.pi * rng.random_sample(n)
+    r = r_min + r_width * rng.random_sample(n)
+    return np.array([r * np.cos(alpha), r * np.sin(alpha)]).T
+
+
+def toy_goal(pos):
+    """ Toy1 trajectory from pos to the center (sensory dims of toy1: 5 x then 5 y) """
+    ts = np.array([0., 0.3, 0.5, 0.8, 1.])
+    return np.hstack((pos[:, :1] * (1. - ts) / 2., pos[:, 1:] * (1. - ts) / 2.))
+
+
+def nn_dists(module, S):
+    """ Distance of each goal of S to its nearest sensory point in the dataset of module (inf if empty) """
+    sm = module.sensorimotor_model
+    dataset = sm.dataset
+    if len(dataset) == 0:
+        return np.full(len(S), np.inf)
+    if sm.index is not None:
+        return sm.index.knn_y(S, 1)[0][:, 0]
+    return np.array([dataset.nn_y(s)[0][0] for s in S])
+
+
+def inverse_batch(module, S):
+    """ module.inverse(s, explore=False) for each goal of S, batched when the model is bootstrapped """
+    sm = module.sensorimotor_model
+    if len(S) == 0:
+        return np.zeros((0, len(module.m_space)))
+    if sm.t >= max(sm.model.imodel.fmodel.k, sm.model.imodel.k) and sm.bootstrapped_s:
+        return sm.infer_order_batch(S)
+    # random commands before bootstrap: the learning state (mode, random state, last command) is restored
+    mode, rng_state, m = sm.mode, sm.rng.get_state(), getattr(module, "m", None)
+    M = np.array([module.inverse(s, explore=False) for s in S])
+    sm.mode, module.m = mode, m
+    sm.rng.set_state(rng_state)
+    return M
+
+
+def _rollouts(environment, states, M):
+    return np.array([environment.simulate(state, [m])[0] for state, m in zip(states, M)])
+
+
+_worker_env = None
+
+def _init_worker(make_env):
+    global _worker_env
+    _worker_env = make_env()
+
+def _worker_rollouts(args):
+    return _rollouts(_worker_env, *args)
+
+
+class CompetenceEvaluation(object):
+    """
+    n_workers > 0: rollouts are simulated by worker processes, each with its own
+    environment built by make_env (e.g. its own Octave session for vocal rollouts).
+    Call close() to stop them.
+
+    """
+    def __init__(self, n_goals=100, regions=(1, 2, 3), arm_mid="mod3", diva_mid="mod10", n_workers=0, make_env=None, chunk_size=10, rng=np.random):
+        self.n_goals = n_goals
+        self.region_list = list(regions)
+        self.regions = np.repeat(regions, n_goals)
+        self.goal_ids = np.tile(np.arange(n_goals), len(regions))
+        self.rng = rng
+        self.toy_pos = None
+        self.goals = None
+        self.arm_mid = arm_mid
+        self.diva_mid = diva_mid
+        self.n_workers = n_workers
+        self.make_env = make_env
+        self.chunk_size = chunk_size
+        self.pool = None
+
+    def draw_goals(self):
+        """ Drawn at the first evaluation (not at creation, which may be before training starts drawing from rng) """
+        self.toy_pos = np.vstack([rand2d(region, self.n_goals, self.rng) for region in self.region_list])
+        self.goals = toy_goal(self.toy_pos)
+
+    def __len__(self):
+        return len(self.regions)
+
+    def rollouts(self, environment, states, M):
+        if self.n_workers == 0:
+            return _rollouts(environment, states, M)
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.n_workers, initializer=_init_worker, initargs=(self.make_env,))
+        chunks = [(states[i:i + self.chunk_size], M[i:i + self.chunk_size]) for i in range(0, len(M), self.chunk_size)]
+        return np.vstack(self.pool.map(_worker_rollouts, chunks))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def evaluate(self, agent, environment):
+        """ Evaluate the agent from the current state of the environment, returns a dict of arrays (one row per goal)
+        and the version of the evaluation """
+        if self.goals is None:
+            self.draw_goals()
+        with metrics.span("evaluation"):
+            base = environment.snapshot()
+            states = [environment.state_with_toys(base, pos) for pos in self.toy_pos]
+            contexts = np.array([state["current_context"] for state in states])
+
+            arm, diva = agent.modules[self.arm_mid], agent.modules[self.diva_mid]
+            S_arm = np.hstack((contexts[:, arm.c_index], self.goals))
+            S_diva = np.hstack((contexts[:, diva.c_index], self.goals))
+            arm_dist = nn_dists(arm, S_arm)
+            diva_dist = nn_dists(diva, S_diva)
+            use_diva = ~(arm_dist < diva_dist)
+
+            M = np.zeros((len(self), agent.conf.m_ndims))
+            M[np.ix_(~use_diva, agent.m_arm)] = inverse_batch(arm, S_arm[~use_diva])
+            M[np.ix_(use_diva, agent.m_diva)] = inverse_batch(diva, S_diva[use_diva])
+
+            with metrics.span("evaluation.rollouts"):
+                S = self.rollouts(environment, states, M)
+            reached = S[:, environment.s_toy1]
+            tool = S[:, environment.s_tool]
+
+        return dict(t=environment.t,
+                    version=version,
+                    region=self.regions,
+                    goal=self.goal_ids,
+                    toy_pos=self.toy_pos,
+                    arm_dist=arm_dist,
+                    diva_dist=diva_dist,
+                    use_diva=use_diva,
+                    comp_error=np.linalg.norm(reached - self.goals, axis=1),
+                    reached=reached[:, 0] != reached[:, 4],
+                    tool=tool[:, 0] != tool[:, 4])
+
+
+def eval_results(results, toy="toy1"):
+    """ results of CompetenceEvaluation.evaluate as the nested dict eval_results[region][goal][toy] of run.py logs """
+    nested = {}
+    for i in range(len(results["region"])):
+        nested.setdefault(int(results["region"][i]), {})[int(results["goal"][i])] = {toy: dict(
+            toy_pos=list(results["toy_pos"][i] / 2.),
+            reached=bool(results["reached"][i]),
+            tool=bool(results["tool"][i]),
+            comp_error=results["comp_error"][i],
+            arm_dist=results["arm_dist"][i],
+            diva_dist=results["diva_dist"][i])}
+    return nested
+
+
+class BackgroundEvaluation(object):
+    """
+    Evaluations run in forked children, which hold copy-on-write snapshots of the agent
+    and the environment, while the parent keeps learning. At most max_children run at once
+    (start waits for one to finish). Each child dumps its results in out_dir, and the parent
+    collects them with poll or join, into self.results.
+
+    """
+    def __init__(self, evaluation, out_dir, max_children=1):
+        self.evaluation = evaluation
+        self.out_dir = out_dir
+        self.max_children = max_children
+        self.children = collections.OrderedDict() # pid: filename, oldest first
+        self.results = []
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+
+    def start(self, agent, environment):
+        while len(self.children) >= self.max_children:
+            self.wait()
+        if self.evaluation.goals is None:
+            self.evaluation.draw_goals() # in the parent, so that all children evaluate the same goals
+        filename = os.path.join(self.out_dir, 'eval-{}.pickle'.format(environment.t))
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                self.evaluation.pool = None # the parent's workers are not ours
+                if hasattr(environment, "diva"):
+                    environment.diva.synth.detach()
+                results = self.evaluation.evaluate(agent, environment)
+                with open(filename + '.tmp', 'wb') as f:
+                    cPickle.dump(results, f, cPickle.HIGHEST_PROTOCOL)
+                os.rename(filename + '.tmp', filename)
+                status = 0
+            except:
+                traceback.print_exc()
+            finally:
+                self.evaluation.close()
+                sys.stdout.flush()
+                os._exit(status)
+        self.children[pid] = filename
+
+    def collect(self, pid, status):
+        filename = self.children.pop(pid, None)
+        if filename is None:
+            return
+        if status == 0 and os.path.exists(filename):
+            with open(filename, 'rb') as f:
+                self.results.append(cPickle.load(f))
+        else:
+            print "Warning: evaluation", filename, "failed"
+
+    def wait(self):
+        """ Wait for the oldest child """
+        pid = next(iter(self.children))
+        self.collect(*os.waitpid(pid, 0))
+
+    def poll(self):
+        """ Collect the finished children without waiting """
+        for pid in list(self.children):
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                self.collect(pid, status)
+
+    def join(self):
+        while self.children:
+            self.wait()
+        self.results.sort(key=lambda results: results["t"])
+        return self.results
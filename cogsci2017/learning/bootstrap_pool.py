@@ -0,0 +1,28 @@
+import numpy as np
+
+
+class BootstrapPool(object):
+    """
+    Pool of motor babbling samples: the m+s vectors of motor babbling iterations
+    (the context being the first 6 sensory dims), followed by the formants of their
+    sound (see CogSci2017Environment.replay), pre-generated once by
+    scripts/bootstrap_pool.py into a .npy file.
+
+    The file is memory-mapped read-only, so that all the trials running on a node
+    share the same pages, and a trial only reads the samples it draws.
+
+    """
+    def __init__(self, filename):
+        self.data = np.load(filename, mmap_mode='r')
+
+    def draw(self, n, rng=np.random):
+        """ n samples (n, ndims) in random order, without replacement if the pool is large enough """
+        idx = rng.choice(len(self), n, replace=n > len(self))
+        # read the pages in file order
+        order = np.argsort(idx)
+        samples = np.empty((n, self.data.shape[1]), dtype=self.data.dtype)
+        samples[order] = self.data[idx[order]]
+        return samples
+
+    def __len__(self):
+        return len(self.data)
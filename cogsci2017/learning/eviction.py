@@ -0,0 +1,115 @@
+import numpy as np
+
+
+# Eviction policies of capacity-bounded datasets.
+# insert(s) returns where the new point is stored: its index if the dataset
+# is not full (appended), the index of the evicted point it replaces, or None
+# if the new point is dropped.
+
+
+class Eviction(object):
+    def __init__(self, capacity, rng=np.random):
+        self.capacity = capacity
+        self.rng = rng
+        self.n_seen = 0
+        self.size = 0
+
+    def insert(self, s):
+        self.n_seen += 1
+        if self.size < self.capacity:
+            idx = self.size
+            self.size += 1
+        else:
+            idx = self.evict(s)
+        if idx is not None:
+            self.stored(idx, s)
+        return idx
+
+    def evict(self, s):
+        raise NotImplementedError
+
+    def stored(self, idx, s):
+        pass
+
+
+class Reservoir(Eviction):
+    """ Uniform sample of all the points seen (reservoir sampling) """
+    def evict(self, s):
+        idx = self.rng.randint(self.n_seen)
+        return idx if idx < self.capacity else None
+
+
+class KeepRecent(Eviction):
+    """ The capacity most recent points (ring buffer) """
+    def evict(self, s):
+        return (self.n_seen - 1) % self.capacity
+
+
+class Grid(Eviction):
+    """
+    Deduplication on a grid of the sensory space: a new point replaces a random point
+    of its cell, or of the most populated cell if its cell is empty, so that
+    the dataset covers the reached sensory space as uniformly as possible.
+
+    """
+    def __init__(self, capacity, rng=np.random, cell_size=0.1):
+        Eviction.__init__(self, capacity, rng)
+        self.cell_size = cell_size
+        self.cell_of = {}   # idx: cell
+        self.members = {}   # cell: list of idx
+        self.by_count = {}  # count: set of cells
+        self.max_count = 0
+
+    def cell(self, s):
+        return tuple(np.floor(np.asarray(s) / self.cell_size).astype(int))
+
+    def _move(self, cell, delta):
+        n = len(self.members.get(cell, []))
+        if n > 0:
+            self.by_count[n].discard(cell)
+        if n + delta > 0:
+            self.by_count.setdefault(n + delta, set()).add(cell)
+        if n + delta > self.max_count:
+            self.max_count = n + delta
+        while self.max_count > 0 and not self.by_count.get(self.max_count):
+            self.max_count -= 1
+
+    def evict(self, s):
+        members = self.members.get(self.cell(s))
+        if not members:
+            members = self.members[next(iter(self.by_count[self.max_count]))]
+        return members[self.rng.randint(len(members))]
+
+    def stored(self, idx, s):
+        if idx in self.cell_of:
+            old = self.cell_of[idx]
+            self._move(old, -1)
+            self.members[old].remove(idx)
+        cell = self.cell(s)
+        self._move(cell, 1)
+        self.members.setdefault(cell, []).append(idx)
+        self.cell_of[idx] = cell
+
+
+evictions = dict(reservoir=Reservoir,
+                 recent=KeepRecent,
+                 grid=Grid)
+
+
+def make_eviction(capacity, policy="reservoir", rng=np.random, **kwargs):
+    """ Eviction policy, or None if capacity is None (unbounded dataset) """
+    if capacity is None:
+        return None
+    return evictions[policy](capacity, rng=rng, **kwargs)
+
+
+def replace_xy(dataset, idx, x, y=None):
+    """ Replace the point idx of an explauto Dataset or BufferedDataset (its kd-trees are rebuilt at the next query) """
+    if hasattr(dataset, "buffer"):
+        dataset.nn_ready = [False, False]
+        if idx >= dataset.size:
+            dataset, idx = dataset.buffer, idx - dataset.size
+    dataset.data[0][idx] = np.array(x)
+    if dataset.dim_y > 0:
+        dataset.data[1][idx] = np.array(y)
+    dataset.nn_ready = [False, False]
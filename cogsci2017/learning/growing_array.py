@@ -0,0 +1,30 @@
+import numpy as np
+
+
+class GrowingArray(object):
+    """ Typed array with amortized append: capacity is preallocated and doubled when full """
+    def __init__(self, shape=(), dtype=np.float64, capacity=1024):
+        self.data = np.zeros((max(capacity, 1),) + tuple(shape), dtype=dtype)
+        self.n = 0
+
+    def append(self, x):
+        if self.n == len(self.data):
+            self.data = np.concatenate((self.data, np.zeros_like(self.data)))
+        self.data[self.n] = x
+        self.n += 1
+
+    def extend(self, xs):
+        xs = np.asarray(xs, dtype=self.data.dtype).reshape((-1,) + self.data.shape[1:])
+        while self.n + len(xs) > len(self.data):
+            self.data = np.concatenate((self.data, np.zeros_like(self.data)))
+        self.data[self.n:self.n + len(xs)] = xs
+        self.n += len(xs)
+
+    def clear(self):
+        self.n = 0
+
+    def view(self):
+        return self.data[:self.n]
+
+    def __len__(self):
+        return self.n
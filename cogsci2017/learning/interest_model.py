@@ -4,6 +4,9 @@ import numpy as np
 from explauto.interest_model.random import RandomInterest
 from explauto.interest_model.competences import competence_dist
 from explauto.models.dataset import Dataset
+from ..rng import rand_bounds, spawn_rng
+from ..metrics import metrics
+from eviction import make_eviction, replace_xy
 
 
 class MiscRandomInterest(RandomInterest):
@@ -14,6 +17,9 @@ class MiscRandomInterest(RandomInterest):
     the recent competence on the babbled points in the whole space, 
     the competence around a given point based on a mean of the knns.   
     
+    With a capacity, the datasets keep at most capacity points, chosen by the
+    eviction policy ('recent', 'reservoir' or 'grid' on reached points).
+    
     """
     def __init__(self, 
                  conf, 
@@ -21,10 +27,14 @@ class MiscRandomInterest(RandomInterest):
                  win_size,
                  competence_mode,
                  k,
-                 progress_mode):
+                 progress_mode,
+                 rng=None,
+                 capacity=None,
+                 eviction='recent'):
         
         RandomInterest.__init__(self, conf, expl_dims)
         
+        self.rng = rng if rng is not None else np.random
         self.win_size = win_size
         self.competence_mode = competence_mode
         self.dist_max = np.linalg.norm(self.bounds[0,:] - self.bounds[1,:])
@@ -33,6 +43,7 @@ class MiscRandomInterest(RandomInterest):
         self.data_xc = Dataset(len(expl_dims), 0)
         self.data_sr = Dataset(len(expl_dims), 0)
         self.data_sp = Dataset(len(expl_dims), 0)
+        self.eviction = make_eviction(capacity, eviction, rng=spawn_rng(self.rng)) if capacity is not None else None
         self.current_competence_progress = 0.
         self.current_prediction_progress = 0.
         self.current_progress = 0.
@@ -52,6 +63,9 @@ class MiscRandomInterest(RandomInterest):
         self.current_progress = progress
         self.current_interest = interest
     
+    def sample(self):
+        return rand_bounds(self.bounds, rng=self.rng).flatten()
+    
     def competence_measure(self, sg, s, dist_max):
         return competence_dist(sg, s, dist_max=dist_max)
     
@@ -64,7 +78,18 @@ class MiscRandomInterest(RandomInterest):
     def add_sp(self, x):
         self.data_sp.add_xy(x)
         
+    def add_point(self, xc, sr, sp):
+        idx = self.eviction.insert(sr) if self.eviction is not None else self.n_points()
+        if idx == self.n_points():
+            self.add_xc(xc)
+            self.add_sr(sr)
+            self.add_sp(sp)
+        elif idx is not None:
+            for dataset, x in [(self.data_xc, xc), (self.data_sr, sr), (self.data_sp, sp)]:
+                replace_xy(dataset, idx, x)
+        
     def update_interest(self, cp, pp):
+        metrics.count("interest.update")
         self.current_competence_progress += (1. / self.win_size) * (cp - self.current_competence_progress)
         self.current_prediction_progress += (1. / self.win_size) * (pp - self.current_prediction_progress)
         self.current_progress = self.alpha * self.current_competence_progress + self.beta * self.current_prediction_progress
@@ -75,13 +100,12 @@ class MiscRandomInterest(RandomInterest):
             c = self.competence_measure(xy[self.expl_dims], ms[self.expl_dims], dist_max=self.dist_max)
             p = self.competence_measure(sp, ms[self.expl_dims], dist_max=self.dist_max)
             
-            cp = self.new_competence_progress(xy[self.expl_dims], c)
-            pp = self.new_prediction_progress(ms[self.expl_dims], p)
+            with metrics.span("interest.progress"):
+                cp = self.new_competence_progress(xy[self.expl_dims], c)
+                pp = self.new_prediction_progress(ms[self.expl_dims], p)
             
             self.update_interest(cp, pp)
-            self.add_xc(xy[self.expl_dims])
-            self.add_sr(ms[self.expl_dims])
-            self.add_sp(sp)
+            self.add_point(xy[self.expl_dims], ms[self.expl_dims], sp)
     
     def n_points(self):
         return len(self.data_xc)
@@ -130,7 +154,10 @@ class ContextRandomInterest(MiscRandomInterest):
                  competence_mode,
                  k,
                  progress_mode,
-                 context_mode):
+                 context_mode,
+                 rng=None,
+                 capacity=None,
+                 eviction='recent'):
         
         self.context_mode = context_mode
         
@@ -140,7 +167,10 @@ class ContextRandomInterest(MiscRandomInterest):
                                      win_size,
                                      competence_mode,
                                      k,
-                                     progress_mode)        
+                                     progress_mode,
+                                     rng,
+                                     capacity,
+                                     eviction)        
 
               
     def competence_measure(self, csg, cs, dist_max):
@@ -3,16 +3,26 @@ import numpy as np
 from numpy import array, hstack
 
 from explauto.agent import Agent
-from explauto.utils import rand_bounds
+from ..rng import rand_bounds, spawn_rng
 from explauto.utils.config import make_configuration
 from explauto.exceptions import ExplautoBootstrapError
 
 from sensorimotor_model import DemonstrableNN
 from interest_model import MiscRandomInterest, ContextRandomInterest
+from ..metrics import metrics
+
+
+def index_view(dims):
+    """ Index of dims in a vector: a slice if dims are contiguous (basic indexing), else an index array """
+    dims = list(dims)
+    if len(dims) > 0 and dims == range(dims[0], dims[0] + len(dims)):
+        return slice(dims[0], dims[0] + len(dims))
+    return np.array(dims, dtype=int)
 
 
 class LearningModule(Agent):
-    def __init__(self, mid, m_space, s_space, env_conf, explo_noise=0.1, imitate=None, proba_imitate=0.5, context_mode=None):
+    def __init__(self, mid, m_space, s_space, env_conf, explo_noise=0.1, imitate=None, proba_imitate=0.5, context_mode=None, dtype=np.float64, rng=None, sm_model=('NN', 'NN'),
+                 sm_capacity=None, sm_eviction='reservoir', im_capacity=None, im_eviction='recent'):
 
         #print mid, m_space, s_space
         self.conf = make_configuration(env_conf.m_mins[m_space], 
@@ -26,9 +36,13 @@ class LearningModule(Agent):
         self.m_space = m_space
         self.context_mode = context_mode
         self.s_space = s_space
+        self.m_index = index_view(m_space)
+        self.s_index = index_view(s_space)
+        self.c_index = index_view(context_mode["context_dims"]) if context_mode is not None else None
         self.motor_babbling_n_iter = 0
         self.proba_imitate = proba_imitate
         self.imitate = imitate
+        self.rng = rng if rng is not None else np.random
         
         self.s = None
         self.sp = None
@@ -41,18 +55,24 @@ class LearningModule(Agent):
                                'competence_mode': 'knn',
                                'k': 20,
                                'progress_mode': 'local',
-                               'context_mode':context_mode})
+                               'context_mode':context_mode,
+                               'rng':spawn_rng(self.rng),
+                               'capacity':im_capacity,
+                               'eviction':im_eviction})
         else:
             im_cls, kwargs = (MiscRandomInterest, {
                                'win_size': 1000,
                                'competence_mode': 'knn',
                                'k': 20,
-                               'progress_mode': 'local'})
+                               'progress_mode': 'local',
+                               'rng':spawn_rng(self.rng),
+                               'capacity':im_capacity,
+                               'eviction':im_eviction})
             
         
         self.im = im_cls(self.conf, self.im_dims, **kwargs)
         
-        sm_cls, kwargs = (DemonstrableNN, {'fwd': 'NN', 'inv': 'NN', 'sigma_explo_ratio':explo_noise})
+        sm_cls, kwargs = (DemonstrableNN, {'fwd': sm_model[0], 'inv': sm_model[1], 'sigma_explo_ratio':explo_noise, 'dtype':dtype, 'rng':spawn_rng(self.rng), 'capacity':sm_capacity, 'eviction':sm_eviction})
         self.sm = sm_cls(self.conf, **kwargs)
         
         Agent.__init__(self, self.conf, self.sm, self.im, context_mode=self.context_mode)
@@ -60,18 +80,18 @@ class LearningModule(Agent):
         
     def motor_babbling(self, n=1): 
         if n == 1:
-            return rand_bounds(self.conf.m_bounds)[0]
+            return rand_bounds(self.conf.m_bounds, rng=self.rng)[0]
         else:
-            return rand_bounds(self.conf.m_bounds, n)
+            return rand_bounds(self.conf.m_bounds, n, rng=self.rng)
         
     def goal_babbling(self):
-        s = rand_bounds(self.conf.s_bounds)[0]
+        s = rand_bounds(self.conf.s_bounds, rng=self.rng)[0]
         m = self.sm.infer(self.conf.s_dims, self.conf.m_dims, s)
         return m
             
-    def get_m(self, ms): return array(ms[self.m_space])
-    def get_s(self, ms): return array(ms[self.s_space])
-    def get_c(self, context): return array(context)[self.context_mode["context_dims"]]
+    def get_m(self, ms): return array(ms[self.m_index])
+    def get_s(self, ms): return array(ms[self.s_index])
+    def get_c(self, context): return array(context)[self.c_index]
         
     def set_one_m(self, ms, m):
         """ Set motor dimensions used by module
@@ -104,7 +124,8 @@ class LearningModule(Agent):
     def infer(self, expl_dims, inf_dims, x, pref='', explore=True):      
         mode = "explore" if explore else "exploit"
         self.sensorimotor_model.mode = mode
-        m, sp = self.sensorimotor_model.infer(expl_dims, inf_dims, x.flatten())
+        with metrics.span("module.infer"):
+            m, sp = self.sensorimotor_model.infer(expl_dims, inf_dims, x.flatten())
         return m, sp
     
     def update_imitation_goals(self, imitate_sm, time_window=100):
@@ -119,10 +140,10 @@ class LearningModule(Agent):
         self.update_imitation_goals(imitate_sm)
         if len(imitate_sm) > 0:
             if mode == "uniform":
-                goal = np.array(self.goal_dict.values()[np.random.choice(range(len(self.goal_dict)))])
+                goal = np.array(self.goal_dict.values()[self.rng.choice(range(len(self.goal_dict)))])
                 return goal
             elif mode == "proportional":
-                return np.array(np.random.choice(self.goal_dict.values()))
+                return np.array(self.rng.choice(self.goal_dict.values()))
         else:
             return np.zeros(len(self.expl_dims))
             
@@ -132,7 +153,7 @@ class LearningModule(Agent):
             self.s = np.zeros(len(self.s_space))
             self.x = np.zeros(len(self.expl_dims))
         else:
-            if imitate_sm is not None and np.random.random() < self.proba_imitate:
+            if imitate_sm is not None and self.rng.random_sample() < self.proba_imitate:
                 self.x = np.array(self.imitate_goal(imitate_sm))
                 #print self.x
             else:
@@ -151,12 +172,14 @@ class LearningModule(Agent):
     
     def update_sm(self, m, s): 
         if self.s_moved(s):
-            self.sensorimotor_model.update(m, s)   
+            with metrics.span("module.update_sm"):
+                self.sensorimotor_model.update(m, s)   
             self.t += 1 
     
     def update_im(self, m, s):
         if self.t >= self.motor_babbling_n_iter:
-            self.interest_model.update(hstack((m, self.s)), hstack((m, s)), self.sp)
+            with metrics.span("module.update_im"):
+                self.interest_model.update(hstack((m, self.s)), hstack((m, s)), self.sp)
         
     def competence(self): return self.interest_model.competence()
     def progress(self): return self.interest_model.progress()
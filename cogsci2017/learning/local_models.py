@@ -0,0 +1,92 @@
+import numpy as np
+
+
+# Forward and inverse models on a JointIndex, computed for batches of queries with
+# stacked numpy linear algebra instead of one explauto call (and python loops) per query.
+
+
+def lwlr(X, Y, xq, dists, sigma_sq):
+    """
+    Locally weighted linear regression of explauto's LWLRForwardModel.predict_y, for a batch
+    of queries xq (n, dim_x) with neighbors X (n, k, dim_x), Y (n, k, dim_y) at distances dists (n, k).
+
+    Returns the predictions (n, dim_y) and the local linear models (n, 1 + dim_x, dim_y):
+    y = mat[0] + x . mat[1:]
+
+    """
+    w = np.exp(-dists ** 2 / (2. * sigma_sq))
+    wsum = w.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        w = np.where(w > wsum * 1e-10 / X.shape[2], w / wsum, 0.)
+    w[wsum[:, 0] == 0] = 1. / X.shape[1]
+
+    Xp = np.concatenate((np.ones(X.shape[:2] + (1,)), X), axis=2)
+    # pinv(WX) = pinv(WX'WX) WX'
+    mat = np.matmul(np.linalg.pinv(w[:, :, None] * Xp), w[:, :, None] * Y)
+    xqp = np.hstack((np.ones((len(xq), 1)), xq))
+    return np.matmul(xqp[:, None, :], mat)[:, 0, :], mat
+
+
+class LWLRForward(object):
+    """ LWLR forward model on the k nearest motor neighbors of the queries in index """
+    def __init__(self, index, k=10, sigma=1.):
+        self.index = index
+        self.k = k
+        self.sigma_sq = sigma * sigma
+
+    def local_models(self, M):
+        M = np.atleast_2d(M)
+        dists, idx = self.index.knn_x(M, self.k)
+        return lwlr(self.index.get_x(idx), self.index.get_y(idx), M, dists, self.sigma_sq)
+
+    def predict(self, M):
+        """ Predicted effects (n, dim_y) of the motor commands M (n, dim_x) """
+        return self.local_models(M)[0]
+
+
+class OptimizedInverse(object):
+    """
+    Inverse model minimizing the squared error between the goals and the predicted effects
+    of a LWLRForward model (as explauto's L-BFGS-B inverse), for a batch of goals at once.
+
+    Each goal is warm-started from the motor command of its nearest sensory neighbor
+    (or from given commands, e.g. the solutions of a previous call), then refined by
+    bounded Gauss-Newton steps on the local linear models, halving the step of the goals
+    whose error does not decrease.
+
+    """
+    def __init__(self, index, fmodel, m_mins, m_maxs, maxiter=10, tol=1e-6, min_step=1e-2):
+        self.index = index
+        self.fmodel = fmodel
+        self.m_mins = np.asarray(m_mins, dtype=float)
+        self.m_maxs = np.asarray(m_maxs, dtype=float)
+        self.maxiter = maxiter
+        self.tol = tol
+        self.min_step = min_step
+
+    def infer(self, S, M0=None):
+        """ Motor commands (n, dim_x) reaching the goals S (n, dim_y) """
+        S = np.atleast_2d(S)
+        if M0 is None:
+            M0 = self.index.get_x(self.index.knn_y(S, 1)[1][:, 0])
+        M = np.clip(M0, self.m_mins, self.m_maxs)
+        pred, mat = self.fmodel.local_models(M)
+        err = np.sum((pred - S) ** 2, axis=1)
+        step = np.ones(len(S))
+
+        for _ in range(self.maxiter):
+            active = np.where((err > self.tol) & (step >= self.min_step))[0]
+            if len(active) == 0:
+                break
+            # smallest dm such that dm . mat[1:] = S - pred
+            dm = np.matmul((S[active] - pred[active])[:, None, :], np.linalg.pinv(mat[active, 1:, :]))[:, 0, :]
+            M_new = np.clip(M[active] + step[active, None] * dm, self.m_mins, self.m_maxs)
+            pred_new, mat_new = self.fmodel.local_models(M_new)
+            err_new = np.sum((pred_new - S[active]) ** 2, axis=1)
+
+            better = err_new < err[active]
+            accepted = active[better]
+            M[accepted], pred[accepted], mat[accepted], err[accepted] = M_new[better], pred_new[better], mat_new[better], err_new[better]
+            step[accepted] = 1.
+            step[active[~better]] /= 2.
+        return M
@@ -0,0 +1,141 @@
+import numpy as np
+import scipy.spatial
+
+from growing_array import GrowingArray
+
+
+def nearest(data, v):
+    """ Index and squared distance of the nearest row of data to v (the first one if several) """
+    d = data - v
+    d2 = np.einsum('ij,ij->i', d, d)
+    idx = int(np.argmin(d2))
+    return idx, d2[idx]
+
+
+class JointIndex(object):
+    """
+    Motor (x) and sensory (y) points of a sensorimotor dataset in two contiguous arrays,
+    for exact nearest neighbor queries on both sides.
+
+    As in explauto's BufferedDataset, the last points are not in the kd-trees until
+    more than buffer_size of them have been added, but they are searched by one
+    vectorized pass instead of a kd-tree rebuilt at each query, and the trees are
+    built on the arrays without copying the points.
+
+    Queries can be given an upper bound of the nearest neighbor distance, e.g. the
+    distance to a known point of the dataset, which prunes most of the kd-tree search.
+
+    Points can be replaced in place (bounded datasets): replaced points are stale
+    in the kd-trees, where they are skipped, and are searched with the recent points
+    until the next rebuild.
+
+    """
+    def __init__(self, dim_x, dim_y, dtype=np.float64, capacity=1024, buffer_size=200):
+        self.data = [GrowingArray((dim_x,), dtype, capacity), GrowingArray((dim_y,), dtype, capacity)]
+        self.buffer_size = buffer_size
+        self.trees = [None, None]
+        self.n_indexed = [0, 0]
+        self.stale = [[], []]
+        self.stale_mask = [np.zeros(0, dtype=bool), np.zeros(0, dtype=bool)]
+
+    def add_xy(self, x, y):
+        self.data[0].append(x)
+        self.data[1].append(y)
+
+    def add_xy_batch(self, x_list, y_list):
+        self.data[0].extend(x_list)
+        self.data[1].extend(y_list)
+
+    def replace(self, index, x, y):
+        self.data[0].data[index] = x
+        self.data[1].data[index] = y
+        for side in [0, 1]:
+            if index < self.n_indexed[side] and not self.stale_mask[side][index]:
+                self.stale_mask[side][index] = True
+                self.stale[side].append(index)
+
+    def get_x(self, index): return self.data[0].data[index]
+    def get_y(self, index): return self.data[1].data[index]
+
+    def nn_x(self, x, bound=np.inf): return self._nn(0, x, bound)
+    def nn_y(self, y, bound=np.inf): return self._nn(1, y, bound)
+
+    def _update_tree(self, side):
+        data = self.data[side].view()
+        if len(data) - self.n_indexed[side] + len(self.stale[side]) > self.buffer_size:
+            self.trees[side] = scipy.spatial.cKDTree(data, compact_nodes=False, balanced_tree=False)
+            self.n_indexed[side] = len(data)
+            self.stale[side] = []
+            self.stale_mask[side] = np.zeros(len(data), dtype=bool)
+
+    def _fresh(self, side):
+        """ Indices of the points searched outside the kd-tree: recent and stale points """
+        return np.concatenate((np.arange(self.n_indexed[side], len(self)), np.array(self.stale[side], dtype=int)))
+
+    def _tree_knn(self, side, V, k):
+        """ k nearest neighbors in the kd-tree, stale points skipped (inf distance if not enough points) """
+        n_tree = self.n_indexed[side]
+        kq = min(k, n_tree)
+        while True:
+            dists, idx = self.trees[side].query(V, k=kq)
+            dists, idx = dists.reshape((len(V), kq)), idx.reshape((len(V), kq))
+            valid = idx < n_tree
+            valid[valid] = ~self.stale_mask[side][idx[valid]]
+            if kq == n_tree or np.all(np.sum(valid, axis=1) >= k):
+                break
+            kq = min(2 * kq, n_tree)
+        dists = np.where(valid, dists, np.inf)
+        order = np.argsort(dists, axis=1, kind='mergesort')[:, :k]
+        return np.take_along_axis(dists, order, 1), np.take_along_axis(idx, order, 1)
+
+    def _nn(self, side, v, bound=np.inf):
+        """ bound: a distance not smaller than the distance of v to its nearest neighbor """
+        data = self.data[side].view()
+        self._update_tree(side)
+        n_indexed = self.n_indexed[side]
+        if n_indexed == 0:
+            return nearest(data, v)[0]
+        if len(self.stale[side]) > 0:
+            dists, idxs = self._tree_knn(side, np.atleast_2d(v), 1)
+            dist, idx = dists[0, 0], idxs[0, 0]
+            fresh = self._fresh(side)
+            fresh_idx, fresh_d2 = nearest(data[fresh], v)
+            if np.sqrt(fresh_d2) < dist:
+                dist, idx = np.sqrt(fresh_d2), fresh[fresh_idx]
+            return int(idx)
+        # slightly enlarged: the point at distance bound has to be found by the query
+        dist, idx = self.trees[side].query(v, distance_upper_bound=bound * (1. + 1e-6) + 1e-9)
+        if n_indexed < len(data):
+            buffer_idx, buffer_d2 = nearest(data[n_indexed:], v)
+            if np.sqrt(buffer_d2) < dist:
+                dist, idx = np.sqrt(buffer_d2), n_indexed + buffer_idx
+        if np.isinf(dist):
+            # bound was too small
+            return self._nn(side, v)
+        return int(idx)
+
+    def knn_x(self, X, k=1): return self._knn(0, X, k)
+    def knn_y(self, Y, k=1): return self._knn(1, Y, k)
+
+    def _knn(self, side, V, k=1):
+        """ Distances and indices (n, k) of the k nearest neighbors of the n rows of V, closest first """
+        V = np.atleast_2d(V)
+        data = self.data[side].view()
+        k = min(k, len(data))
+        self._update_tree(side)
+        n_indexed = self.n_indexed[side]
+        dists = np.zeros((len(V), 0))
+        idx = np.zeros((len(V), 0), dtype=int)
+        if n_indexed > 0:
+            dists, idx = self._tree_knn(side, V, k)
+        fresh = self._fresh(side)
+        if len(fresh) > 0:
+            d = data[None, fresh, :] - V[:, None, :]
+            dists = np.hstack((dists, np.sqrt(np.einsum('ijk,ijk->ij', d, d))))
+            idx = np.hstack((idx, np.tile(fresh, (len(V), 1))))
+            order = np.argsort(dists, axis=1, kind='mergesort')[:, :k]
+            dists, idx = np.take_along_axis(dists, order, 1), np.take_along_axis(idx, order, 1)
+        return dists, idx
+
+    def __len__(self):
+        return len(self.data[0])
@@ -0,0 +1,91 @@
+import os
+import numpy as np
+
+from growing_array import GrowingArray
+
+
+class RunRecorder(object):
+    """
+    Bookkeeping of a run: the module chosen at each iteration, stored as small-int codes
+    with running counts, and the competence/prediction progress of each module every
+    evolution_every iterations, stored in preallocated arrays.
+
+    If spill is a filename, the codes are appended to it (raw uint8) by chunks of
+    spill_every iterations, so that memory stays bounded for long runs.
+
+    """
+    def __init__(self, choices, mids, size=0, evolution_every=100, spill=None, spill_every=10000):
+        self.names = list(choices)
+        self.codes = {name: code for code, name in enumerate(self.names)}
+        assert len(self.names) < 256
+        self.mids = list(mids)
+        self.evolution_every = evolution_every
+        self.spill = spill
+        self.spill_every = spill_every
+        self.n_spilled = 0
+        if spill is not None and os.path.exists(spill):
+            os.remove(spill)
+
+        self.counts = np.zeros(len(self.names), dtype=np.int64)
+        self.choices = GrowingArray(dtype=np.uint8, capacity=spill_every if spill is not None else size)
+        self.cp = GrowingArray((len(self.mids),), capacity=size / evolution_every + 1)
+        self.pp = GrowingArray((len(self.mids),), capacity=size / evolution_every + 1)
+
+    def choose(self, name):
+        code = self.codes[name]
+        self.counts[code] += 1
+        self.choices.append(code)
+        if self.spill is not None and len(self.choices) >= self.spill_every:
+            self.flush()
+
+    def count(self, name):
+        return int(self.counts[self.codes[name]])
+
+    def record_progress(self, cp, pp):
+        """ cp, pp: dicts of the current competence and prediction progress of each module """
+        self.cp.append([cp[mid] for mid in self.mids])
+        self.pp.append([pp[mid] for mid in self.mids])
+
+    def flush(self):
+        if self.spill is not None and len(self.choices) > 0:
+            with open(self.spill, 'ab') as f:
+                self.choices.view().tofile(f)
+            self.n_spilled += len(self.choices)
+            self.choices.clear()
+
+    def chosen_codes(self):
+        if self.n_spilled > 0:
+            return np.concatenate((np.fromfile(self.spill, dtype=np.uint8, count=self.n_spilled), self.choices.view()))
+        return self.choices.view().copy()
+
+    def evolution(self, series):
+        return {mid: series.view()[:, i].copy() for i, mid in enumerate(self.mids)}
+
+    def save(self):
+        self.flush()
+        return dict(chosen_modules=dict(names=self.names,
+                                        codes=self.chosen_codes(),
+                                        counts={name: int(c) for name, c in zip(self.names, self.counts)}),
+                    cp_evolution=self.evolution(self.cp),
+                    pp_evolution=self.evolution(self.pp))
+
+
+def chosen_module_counts(agent_log, mids=None):
+    """ Number of times each module was chosen, from the agent log of a run (new or list format) """
+    chosen_modules = agent_log["chosen_modules"]
+    if isinstance(chosen_modules, dict):
+        counts = chosen_modules["counts"]
+    else:
+        counts = {}
+        for mid in chosen_modules:
+            counts[mid] = counts.get(mid, 0) + 1
+    mids = agent_log["pp_evolution"].keys() if mids is None else mids
+    return {mid: counts.get(mid, 0) for mid in mids}
+
+
+def chosen_module_names(agent_log):
+    """ Module chosen at each iteration, from the agent log of a run (new or list format) """
+    chosen_modules = agent_log["chosen_modules"]
+    if isinstance(chosen_modules, dict):
+        return list(np.array(chosen_modules["names"], dtype=object)[chosen_modules["codes"]])
+    return list(chosen_modules)
@@ -4,22 +4,70 @@ from numpy import array
 from explauto.exceptions import ExplautoBootstrapError
 from explauto.sensorimotor_model.non_parametric import NonParametric
 from explauto.utils import bounds_min_max
-from explauto.utils import rand_bounds
+from ..rng import rand_bounds, spawn_rng
+from nn_index import JointIndex
+from local_models import LWLRForward, OptimizedInverse
+from eviction import make_eviction, replace_xy
 
 
 class DemonstrableNN(NonParametric):
-    def __init__(self, conf, sigma_explo_ratio=0.1, fwd='LWLR', inv='L-BFGS-B', **learner_kwargs):
+    """
+    fwd: 'NN', 'fast-LWLR' or an explauto forward model
+    inv: 'NN', 'fast-opt' or an explauto inverse model
+    
+    The NN and fast models are answered from a joint index of the dataset instead
+    of the explauto models, and the points are then only stored in the index (the
+    explauto NN learner stays empty): use self.dataset to access them.
+    fast-LWLR (k=10, sigma=1.) and fast-opt (maxiter=10) are batched versions of
+    explauto's LWLR forward and L-BFGS-B inverse models.
+    
+    With a capacity, the dataset keeps at most capacity points, chosen by the
+    eviction policy ('reservoir', 'grid' with eviction_kwargs cell_size, or 'recent').
+    
+    """
+    def __init__(self, conf, sigma_explo_ratio=0.1, fwd='LWLR', inv='L-BFGS-B', dtype=np.float64, rng=None, 
+                 capacity=None, eviction='reservoir', eviction_kwargs=None, **learner_kwargs):
         self.demonstrated = []
-        NonParametric.__init__(self, conf, sigma_explo_ratio, fwd, inv, **learner_kwargs)        
+        self.rng = rng if rng is not None else np.random
+        self.dtype = np.dtype(dtype)
+        self.fwd = fwd
+        self.inv = inv
+        indexed = fwd in ['NN', 'fast-LWLR'] and inv in ['NN', 'fast-opt']
+        if indexed:
+            NonParametric.__init__(self, conf, sigma_explo_ratio, 'NN', 'NN', **learner_kwargs)        
+            self.index = JointIndex(self.m_ndims, self.s_ndims, dtype=self.dtype)
+        else:
+            NonParametric.__init__(self, conf, sigma_explo_ratio, fwd, inv, **learner_kwargs)        
+            self.index = None
+        self.fmodel = None
+        self.imodel = None
+        if fwd == 'fast-LWLR' or inv == 'fast-opt':
+            assert indexed, "fast models need NN or fast forward and inverse models"
+            self.fmodel = LWLRForward(self.index, k=learner_kwargs.get('k', 10), sigma=learner_kwargs.get('sigma', 1.))
+        if inv == 'fast-opt':
+            self.imodel = OptimizedInverse(self.index, self.fmodel, self.m_mins, self.m_maxs, maxiter=learner_kwargs.get('maxiter', 10))
+        self.eviction = make_eviction(capacity, eviction, rng=spawn_rng(self.rng), **(eviction_kwargs or {})) if capacity is not None else None
+        
+    @property
+    def dataset(self):
+        """ The points (get_x, get_y, len): the joint index if any, else the explauto dataset """
+        return self.index if self.index is not None else self.model.imodel.fmodel.dataset
         
     def save(self):
-        return [[self.model.imodel.fmodel.dataset.get_x(i) for i in range(len(self.model.imodel.fmodel.dataset))],
-                [self.model.imodel.fmodel.dataset.get_y(i) for i in range(len(self.model.imodel.fmodel.dataset))],
+        return [[self.dataset.get_x(i) for i in range(len(self.dataset))],
+                [self.dataset.get_y(i) for i in range(len(self.dataset))],
                 self.bootstrapped_s]
     
     def forward(self, data, iteration):
-        self.model.imodel.fmodel.dataset.add_xy_batch(data[0][:iteration], data[1][:iteration])
-        self.t = len(self.model.imodel.fmodel.dataset)
+        if self.eviction is not None:
+            for m, s in zip(data[0][:iteration], data[1][:iteration]):
+                self.add_xy(m, s)
+        elif self.index is not None:
+            self.index.add_xy_batch(data[0][:iteration], data[1][:iteration])
+        else:
+            self.model.imodel.fmodel.dataset.add_xy_batch([np.asarray(m, dtype=self.dtype) for m in data[0][:iteration]], 
+                                                          [np.asarray(s, dtype=self.dtype) for s in data[1][:iteration]])
+        self.t = len(self.dataset)
         if len(data) > 2:
             self.bootstrapped_s = data[2]
         else:
@@ -28,38 +76,91 @@ class DemonstrableNN(NonParametric):
     def infer(self, in_dims, out_dims, x):
         if self.t < max(self.model.imodel.fmodel.k, self.model.imodel.k):
             res = rand_bounds(np.array([self.m_mins,
-                                        self.m_maxs]))[0]
+                                        self.m_maxs]), rng=self.rng)[0]
             return res, None
 
         if in_dims == self.m_dims and out_dims == self.s_dims:  # forward
-            return array(self.model.predict_effect(tuple(x)))
+            return self.predict_effect(x)
 
         elif in_dims == self.s_dims and out_dims == self.m_dims:  # inverse
             if not self.bootstrapped_s:
                 # If only one distinct point has been observed in the sensory space, then we output a random motor command
                 res = rand_bounds(np.array([self.m_mins,
-                                             self.m_maxs]))[0]
-                sp = array(self.model.predict_effect(tuple(res)))
+                                             self.m_maxs]), rng=self.rng)[0]
+                sp = self.predict_effect(res)
                 return res, sp
             else:
-                self.mean_explore = array(self.model.infer_order(tuple(x)))
+                self.mean_explore, idx = self.infer_order(x)
                 if self.mode == 'explore':
                     r = self.mean_explore
-                    r[self.sigma_expl > 0] = np.random.normal(r[self.sigma_expl > 0], self.sigma_expl[self.sigma_expl > 0])
+                    r[self.sigma_expl > 0] = self.rng.normal(r[self.sigma_expl > 0], self.sigma_expl[self.sigma_expl > 0])
                     res = bounds_min_max(r, self.m_mins, self.m_maxs)
-                    sp = array(self.model.predict_effect(tuple(res)))
+                    if idx is not None and self.fwd == 'NN':
+                        # the goal's neighbor bounds the distance of res to its nearest neighbor
+                        sp = self.predict_effect(res, bound=np.linalg.norm(res - self.index.get_x(idx)))
+                    else:
+                        sp = self.predict_effect(res)
                     return res, sp
                 else:  # exploit'
-                    res = array(self.model.infer_order(tuple(x)))
-                    sp = array(self.model.predict_effect(tuple(res)))
+                    res, idx = self.infer_order(x)
+                    if idx is not None and self.fwd == 'NN':
+                        # res is a point of the dataset: it is its own nearest neighbor
+                        sp = self.index.get_y(idx).copy()
+                    else:
+                        sp = self.predict_effect(res)
                     return res, sp
 
         else:
             raise NotImplementedError
     
+    def infer_order(self, s):
+        """ Motor command of the nearest neighbor of s, and its index in the joint index (None without) """
+        if self.imodel is not None:
+            return self.imodel.infer(s)[0], None
+        if self.index is not None:
+            idx = self.index.nn_y(s)
+            return self.index.get_x(idx).copy(), idx
+        return array(self.model.infer_order(tuple(s))), None
+    
+    def predict_effect(self, m, bound=np.inf):
+        if self.fwd == 'fast-LWLR':
+            return self.fmodel.predict(m)[0]
+        if self.index is not None:
+            return self.index.get_y(self.index.nn_x(m, bound)).copy()
+        return array(self.model.predict_effect(tuple(m)))
+    
+    def infer_order_batch(self, S, M0=None):
+        """ Motor commands (n, m_ndims) for the goals S (n, s_ndims), in exploit mode """
+        if self.imodel is not None:
+            return self.imodel.infer(S, M0)
+        if self.index is not None:
+            return self.index.get_x(self.index.knn_y(S, 1)[1][:, 0])
+        return np.array([self.infer_order(s)[0] for s in S])
+    
+    def predict_effect_batch(self, M):
+        """ Predicted effects (n, s_ndims) of the motor commands M (n, m_ndims) """
+        if self.fwd == 'fast-LWLR':
+            return self.fmodel.predict(M)
+        if self.index is not None:
+            return self.index.get_y(self.index.knn_x(M, 1)[1][:, 0])
+        return np.array([self.predict_effect(m) for m in M])
+    
+    def add_xy(self, m, s):
+        idx = self.eviction.insert(s) if self.eviction is not None else len(self.dataset)
+        if idx == len(self.dataset):
+            if self.index is not None:
+                self.index.add_xy(m, s)
+            else:
+                self.model.add_xy(tuple(np.asarray(m, dtype=self.dtype)), tuple(np.asarray(s, dtype=self.dtype)))
+        elif idx is not None:
+            if self.index is not None:
+                self.index.replace(idx, m, s)
+            else:
+                replace_xy(self.model.imodel.fmodel.dataset, idx, np.asarray(m, dtype=self.dtype), np.asarray(s, dtype=self.dtype))
+    
     def update(self, m, s):
-        self.model.add_xy(tuple(m), tuple(s))
+        self.add_xy(m, s)
         self.t += 1
         if not self.bootstrapped_s and self.t > 1:
-            if not (list(s[2:]) == list(self.model.imodel.fmodel.dataset.get_y(0)[2:])):
+            if not (list(s[2:]) == list(self.dataset.get_y(0)[2:])):
                 self.bootstrapped_s = True
\ No newline at end of file
@@ -1,26 +1,37 @@
 import numpy as np
 
-from explauto.utils import rand_bounds, bounds_min_max, softmax_choice, prop_choice
+from explauto.utils import bounds_min_max
 from explauto.utils.config import make_configuration
 from learning_module import LearningModule
+from run_recorder import RunRecorder
+from ..environment.world_model import sensory_layout
+from ..metrics import metrics
+from ..rng import rand_bounds, softmax_choice, prop_choice, spawn_rng
 
 
 class Supervisor(object):
-    def __init__(self, config, model_babbling="random", n_motor_babbling=0, explo_noise=0.1, choice_eps=0.2, proba_imitate=0.5):
+    def __init__(self, config, model_babbling="random", n_motor_babbling=0, explo_noise=0.1, choice_eps=0.2, proba_imitate=0.5, dtype=np.float64, rng=None, record_size=0, record_spill=None, sm_models=None,
+                 sm_capacity=None, sm_eviction="reservoir", im_capacity=None, im_eviction="recent"):
         
+        # config: bounds of the environment, and the layout of its sensory vector
+        # (s_layout, default: one tool and one toy)
         self.config = config
         self.model_babbling = model_babbling
         self.n_motor_babbling = n_motor_babbling
         self.explo_noise = explo_noise
         self.choice_eps = choice_eps
         self.proba_imitate = proba_imitate
-        self.conf = make_configuration(**config)
+        self.dtype = np.dtype(dtype)
+        self.rng = rng if rng is not None else np.random
+        self.sm_models = sm_models or {} # mid: (fwd, inv) models of DemonstrableNN, default ('NN', 'NN')
+        # Maximum number of points in the datasets of each module (None: unbounded) and eviction policies
+        self.capacity_kwargs = dict(sm_capacity=sm_capacity, sm_eviction=sm_eviction, im_capacity=im_capacity, im_eviction=im_eviction)
+        self.conf = make_configuration(**{k: v for k, v in config.items() if k != "s_layout"})
+        s_layout = config.get("s_layout") or sensory_layout()
+        assert s_layout.values()[-1].stop == self.conf.s_ndims, "s_layout does not match s_mins/s_maxs"
         
         self.t = 0
         self.modules = {}
-        self.chosen_modules = []
-        self.cp_evolution = {}
-        self.pp_evolution = {}
         
         self.mid_control = None
         self.last_cmd = None
@@ -33,21 +44,35 @@ class Supervisor(object):
         
         self.m_arm = range(self.arm_n_dims)
         self.m_diva = range(self.arm_n_dims,self.arm_n_dims + self.diva_n_dims)
+        self.m_arm_slice = slice(0, self.arm_n_dims)
+        self.m_diva_slice = slice(self.arm_n_dims, self.arm_n_dims + self.diva_n_dims)
         self.m_space = range(m_ndims)
-        self.c_dims = range(m_ndims, m_ndims+6)
-        self.s_hand = range(m_ndims+6, m_ndims+16)
-        self.s_tool = range(m_ndims+16, m_ndims+26)
-        self.s_toy1 = range(m_ndims+26, m_ndims+36)
-        self.s_sound = range(m_ndims+36, m_ndims+46)
-        self.s_caregiver = range(m_ndims+46, m_ndims+56)
+        dims = lambda name: range(m_ndims + s_layout[name].start, m_ndims + s_layout[name].stop)
+        n_tools = len([name for name in s_layout if name.startswith("tool")])
+        n_toys = len([name for name in s_layout if name.startswith("toy")])
+        self.c_dims = dims("context")
+        self.s_hand = dims("hand")
+        self.s_tools = [dims("tool{}".format(j + 1)) for j in range(n_tools)]
+        self.s_toys = [dims("toy{}".format(k + 1)) for k in range(n_toys)]
+        self.s_tool = self.s_tools[0]
+        self.s_toy1 = self.s_toys[0]
+        self.s_sound = dims("sound")
+        self.s_caregiver = dims("caregiver")
+        
+        # positions of the first tool, the first toy and the caregiver in the context
+        self.c_tool = [0, 1]
+        self.c_toy1 = [2 * n_tools, 2 * n_tools + 1]
+        self.c_caregiver = [2 * (n_tools + n_toys), 2 * (n_tools + n_toys) + 1]
+        c = lambda context_dims: [self.c_dims[i] for i in context_dims]
         
         self.s_spaces = dict(s_hand=self.s_hand, 
                              s_tool=self.s_tool, 
-                             s_toy1=self.s_toy1, 
-                             #s_toy2=self.s_toy2, 
-                             #s_toy3=self.s_toy3, 
                              s_sound=self.s_sound, 
                              s_caregiver=self.s_caregiver)
+        for j, s_tool in enumerate(self.s_tools[1:]):
+            self.s_spaces["s_tool{}".format(j + 2)] = s_tool
+        for k, s_toy in enumerate(self.s_toys):
+            self.s_spaces["s_toy{}".format(k + 1)] = s_toy
 
         self.arm_modules = ['mod1','mod2','mod3','mod6']
         self.diva_modules = ['mod10','mod13']
@@ -55,23 +80,28 @@ class Supervisor(object):
         
         
         # Create the 10 learning modules:
-        self.modules['mod1'] = LearningModule("mod1", self.m_arm, self.s_hand, self.conf, explo_noise=self.explo_noise, proba_imitate=self.proba_imitate)
-        self.modules['mod2'] = LearningModule("mod2", self.m_arm, self.c_dims[0:2] + self.s_tool, self.conf, context_mode=dict(mode='mcs', context_dims=[0, 1], context_n_dims=2, context_sensory_bounds=[[-1.]*2,[1.]*2]), explo_noise=self.explo_noise, proba_imitate=self.proba_imitate)
-        self.modules['mod3'] = LearningModule("mod3", self.m_arm, self.c_dims[0:4] + self.s_toy1, self.conf, context_mode=dict(mode='mcs', context_dims=[0, 1, 2, 3], context_n_dims=4, context_sensory_bounds=[[-1.]*4,[1.]*4]), explo_noise=self.explo_noise, proba_imitate=self.proba_imitate)
-        self.modules['mod6'] = LearningModule("mod6", self.m_arm, self.c_dims[0:4] + self.s_sound, self.conf, context_mode=dict(mode='mcs', context_dims=[0, 1, 2, 3], context_n_dims=4, context_sensory_bounds=[[-1.]*4,[1.]*4]), explo_noise=self.explo_noise, proba_imitate=self.proba_imitate)
+        self.modules['mod1'] = LearningModule("mod1", self.m_arm, self.s_hand, self.conf, explo_noise=self.explo_noise, proba_imitate=self.proba_imitate, dtype=self.dtype, rng=spawn_rng(self.rng), sm_model=self.sm_models.get("mod1", ("NN", "NN")), **self.capacity_kwargs)
+        self.modules['mod2'] = LearningModule("mod2", self.m_arm, c(self.c_tool) + self.s_tool, self.conf, context_mode=dict(mode='mcs', context_dims=self.c_tool, context_n_dims=2, context_sensory_bounds=[[-1.]*2,[1.]*2]), explo_noise=self.explo_noise, proba_imitate=self.proba_imitate, dtype=self.dtype, rng=spawn_rng(self.rng), sm_model=self.sm_models.get("mod2", ("NN", "NN")), **self.capacity_kwargs)
+        self.modules['mod3'] = LearningModule("mod3", self.m_arm, c(self.c_tool + self.c_toy1) + self.s_toy1, self.conf, context_mode=dict(mode='mcs', context_dims=self.c_tool + self.c_toy1, context_n_dims=4, context_sensory_bounds=[[-1.]*4,[1.]*4]), explo_noise=self.explo_noise, proba_imitate=self.proba_imitate, dtype=self.dtype, rng=spawn_rng(self.rng), sm_model=self.sm_models.get("mod3", ("NN", "NN")), **self.capacity_kwargs)
+        self.modules['mod6'] = LearningModule("mod6", self.m_arm, c(self.c_tool + self.c_toy1) + self.s_sound, self.conf, context_mode=dict(mode='mcs', context_dims=self.c_tool + self.c_toy1, context_n_dims=4, context_sensory_bounds=[[-1.]*4,[1.]*4]), explo_noise=self.explo_noise, proba_imitate=self.proba_imitate, dtype=self.dtype, rng=spawn_rng(self.rng), sm_model=self.sm_models.get("mod6", ("NN", "NN")), **self.capacity_kwargs)
         
-        self.modules['mod10'] = LearningModule("mod10", self.m_diva, self.c_dims[2:4] + self.c_dims[4:6] + self.s_toy1, self.conf, context_mode=dict(mode='mcs', context_dims=[2, 3, 4, 5], context_n_dims=4, context_sensory_bounds=[[-1.]*4,[1.]*4]), explo_noise=self.explo_noise, proba_imitate=self.proba_imitate)
-        self.modules['mod13'] = LearningModule("mod13", self.m_diva, self.s_sound, self.conf, imitate="mod6", explo_noise=self.explo_noise, proba_imitate=self.proba_imitate)
+        self.modules['mod10'] = LearningModule("mod10", self.m_diva, c(self.c_toy1 + self.c_caregiver) + self.s_toy1, self.conf, context_mode=dict(mode='mcs', context_dims=self.c_toy1 + self.c_caregiver, context_n_dims=4, context_sensory_bounds=[[-1.]*4,[1.]*4]), explo_noise=self.explo_noise, proba_imitate=self.proba_imitate, dtype=self.dtype, rng=spawn_rng(self.rng), sm_model=self.sm_models.get("mod10", ("NN", "NN")), **self.capacity_kwargs)
+        self.modules['mod13'] = LearningModule("mod13", self.m_diva, self.s_sound, self.conf, imitate="mod6", explo_noise=self.explo_noise, proba_imitate=self.proba_imitate, dtype=self.dtype, rng=spawn_rng(self.rng), sm_model=self.sm_models.get("mod13", ("NN", "NN")), **self.capacity_kwargs)
 
 
-        for mid in self.modules.keys():
-            self.cp_evolution[mid] = []
-            self.pp_evolution[mid] = []
-            
         self.count_arm = 0
         self.count_diva = 0
         
+        # m+s vector of the current iteration, preallocated:
+        # self.m and self.s are views of it, the environment can write s directly in self.s
+        self.ms = np.zeros(self.conf.ndims, dtype=self.dtype)
+        self.m = self.ms[:m_ndims]
+        self.s = self.ms[m_ndims:]
+        
         self.mids = ["mod"+ str(i) for i in range(1, 15) if "mod"+ str(i) in self.modules.keys()]
+        
+        # Chosen modules and progress evolution, record_size: expected number of iterations
+        self.recorder = RunRecorder(["motor_babbling"] + self.mids, self.mids, size=record_size, spill=record_spill)
 
     
     def mid2motor_space(self, mid):
@@ -86,12 +116,7 @@ class Supervisor(object):
         for mid in self.modules.keys():
             sm_data[mid] = self.modules[mid].sensorimotor_model.save()
             im_data[mid] = self.modules[mid].interest_model.save()            
-        return {
-                #"sm_data":sm_data,
-                #"im_data":im_data,
-                "chosen_modules":self.chosen_modules,
-                "cp_evolution":self.cp_evolution,
-                "pp_evolution":self.pp_evolution,}
+        return self.recorder.save()
 
         
     def choose_babbling_module(self):
@@ -104,25 +129,25 @@ class Supervisor(object):
             interests[mid] = self.modules[mid].interest()
         
         if mode == 'random':
-            if np.random.random() < self.arm_goal_selection:
-                mid = np.random.choice(self.arm_modules)
+            if self.rng.random_sample() < self.arm_goal_selection:
+                mid = self.rng.choice(self.arm_modules)
             else:
-                mid = np.random.choice(self.diva_modules)
+                mid = self.rng.choice(self.diva_modules)
         elif mode == 'greedy':
-            if np.random.random() < self.choice_eps:
-                mid = np.random.choice(interests.keys())
+            if self.rng.random_sample() < self.choice_eps:
+                mid = self.rng.choice(interests.keys())
             else:
                 mid = max(interests, key=interests.get)
         elif mode == 'softmax':
             temperature = self.choice_eps
             w = interests.values()
-            mid = self.modules.keys()[softmax_choice(w, temperature)]
+            mid = self.modules.keys()[softmax_choice(w, temperature, rng=self.rng)]
         
         elif mode == 'prop':
             w = interests.values()
-            mid = self.modules.keys()[prop_choice(w, eps=self.choice_eps)]
+            mid = self.modules.keys()[prop_choice(w, eps=self.choice_eps, rng=self.rng)]
         
-        self.chosen_modules.append(mid)
+        self.recorder.choose(mid)
         return mid
               
         
@@ -142,7 +167,7 @@ class Supervisor(object):
     def get_s(self, ms): return ms[self.conf.s_dims]
     
     def motor_babbling(self, arm=False, audio=False):
-        self.m = rand_bounds(self.conf.m_bounds)[0]
+        self.m[:] = rand_bounds(self.conf.m_bounds, rng=self.rng)[0]
         if arm:
             r = 1.
             self.last_cmd = "arm"
@@ -150,16 +175,37 @@ class Supervisor(object):
             r = 0.
             self.last_cmd = "diva"
         else:
-            r = np.random.random()
+            r = self.rng.random_sample()
         if r > self.arm_goal_selection:
-            self.m[:self.arm_n_dims] = 0.
+            self.m[self.m_arm_slice] = 0.
             self.last_cmd = "diva"
         else:
-            self.m[self.arm_n_dims:] = 0.
+            self.m[self.m_diva_slice] = 0.
             self.last_cmd = "arm"
         return self.m
-    
-    def set_ms(self, m, s): return np.array(list(m) + list(s))
+
+    def bootstrap(self, pool):
+        """
+        Motor babbling phase from samples drawn from a BootstrapPool with self.rng
+        instead of simulated: the remaining n_motor_babbling iterations are perceived
+        as if produced by motor_babbling. Returns the drawn m+s samples.
+
+        """
+        samples = pool.draw(max(self.n_motor_babbling - self.t, 0), rng=self.rng)
+        for ms in samples:
+            self.mid_control = None
+            self.recorder.choose("motor_babbling")
+            self.m[:] = ms[self.m_space]
+            self.last_cmd = "arm" if np.any(self.m[self.m_arm_slice]) else "diva"
+            self._perceive(ms[self.conf.s_dims])
+        return samples
+
+    def set_ms(self, m, s):
+        if m is not self.m:
+            self.m[:] = m
+        if s is not self.s:
+            self.s[:] = s
+        return self.ms
             
     def update_sensorimotor_models(self, ms):
         for mid in self.modules.keys():
@@ -167,32 +213,44 @@ class Supervisor(object):
                 self.modules[mid].update_sm(self.modules[mid].get_m(ms), self.modules[mid].get_s(ms))
         
     def produce(self, context):
+        with metrics.span("supervisor.produce"):
+            return self._produce(context)
+        
+    def _produce(self, context):
         if self.t < self.n_motor_babbling:
             self.mid_control = None
-            self.chosen_modules.append("motor_babbling")
+            self.recorder.choose("motor_babbling")
             return self.motor_babbling()
         else:
-            mid = self.choose_babbling_module()
+            with metrics.span("supervisor.choose"):
+                mid = self.choose_babbling_module()
             self.mid_control = mid
+            metrics.count("chosen." + mid)
             
             mid_c = self.modules[mid].get_c(context) if self.modules[mid].context_mode else None
             
             if self.modules[mid].imitate is not None:
-                m = self.modules[mid].produce(context=mid_c, imitate_sm=self.modules[self.modules[mid].imitate].sm.model.imodel.fmodel.dataset)
+                m = self.modules[mid].produce(context=mid_c, imitate_sm=self.modules[self.modules[mid].imitate].sm.dataset)
             else:                
                 m = self.modules[mid].produce(context=mid_c)
                 
             if self.mid2motor_space(mid) == "arm":
                 self.last_cmd = "arm"
-                self.m = list(m) + [0.]*self.diva_n_dims
+                self.m[self.m_arm_slice] = m
+                self.m[self.m_diva_slice] = 0.
                 self.count_arm += 1
             else:
                 self.last_cmd = "diva"
-                self.m = [0.]*self.arm_n_dims + list(m)
+                self.m[self.m_arm_slice] = 0.
+                self.m[self.m_diva_slice] = m
                 self.count_diva += 1
             return self.m
     
     def perceive(self, s):
+        with metrics.span("supervisor.perceive"):
+            self._perceive(s)
+        
+    def _perceive(self, s):
         s = self.sensory_primitive(s)
         ms = self.set_ms(self.m, s)
         self.update_sensorimotor_models(ms)
@@ -200,10 +258,9 @@ class Supervisor(object):
             self.modules[self.mid_control].update_im(self.modules[self.mid_control].get_m(ms), self.modules[self.mid_control].get_s(ms))
         self.t = self.t + 1
         
-        if self.t % 100 == 0:
-            for mid in self.modules.keys():
-                self.cp_evolution[mid].append(self.modules[mid].interest_model.current_competence_progress)
-                self.pp_evolution[mid].append(self.modules[mid].interest_model.current_prediction_progress)           
+        if self.t % self.recorder.evolution_every == 0:
+            self.recorder.record_progress({mid: self.modules[mid].interest_model.current_competence_progress for mid in self.mids},
+                                          {mid: self.modules[mid].interest_model.current_prediction_progress for mid in self.mids})
             
         if self.t % 1000 == 0:
             self.print_stats() 
@@ -213,7 +270,7 @@ class Supervisor(object):
         print "#Iterations:", self.t
         print
         for mid in self.mids:
-            print "# Chosen module", mid, ":", self.chosen_modules.count(mid)
+            print "# Chosen module", mid, ":", self.recorder.count(mid)
         print
         for mid in self.mids:
             print "Competence progress of", mid, ": " if mid in ["mod10", "mod11", "mod12", "mod13", "mod14"] else " : ", self.modules[mid].interest_model.current_competence_progress
@@ -0,0 +1,153 @@
+import os
+import json
+import numpy as np
+
+try:
+    from time import monotonic as clock
+except ImportError:
+    # python 2: no monotonic clock in the standard library
+    from timeit import default_timer as clock
+
+
+class NullSpan(object):
+    def __enter__(self): return self
+    def __exit__(self, *args): return False
+
+null_span = NullSpan()
+
+
+class Span(object):
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = clock()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.observe(self.name, clock() - self.t0)
+        return False
+
+
+class Histogram(object):
+    """ Count, total, min, max and log-spaced histogram of durations in seconds """
+    bins = np.logspace(-7, 2, 46) # 1e-7s to 100s, 5 bins per decade
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.
+        self.min = np.inf
+        self.max = 0.
+        self.hist = np.zeros(len(self.bins) + 1, dtype=np.int64)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.hist[np.searchsorted(self.bins, value)] += 1
+
+    def save(self):
+        return dict(count=self.count,
+                    total=self.total,
+                    min=self.min,
+                    max=self.max,
+                    hist=self.hist.tolist())
+
+
+class Metrics(object):
+    """
+    Timing spans, counters and histograms of the learning loop.
+
+    Disabled by default: span() then returns a shared no-op context manager.
+    When enabled, the values accumulated since the last flush are appended
+    as one json line to filename every flush_every seconds, and print_stats
+    shows the values accumulated since enable().
+
+        with metrics.span("supervisor.produce"):
+            ...
+
+    """
+    def __init__(self):
+        self.enabled = False
+        self.filename = None
+        self.flush_every = 60.
+        self.total_histograms = {}
+        self.total_counters = {}
+        self.reset()
+
+    def reset(self):
+        """ New flush window """
+        self.histograms = {}
+        self.counters = {}
+        self.last_flush = clock()
+
+    def enable(self, filename=None, flush_every=60.):
+        if filename is not None and not os.path.exists(os.path.dirname(os.path.abspath(filename))):
+            os.makedirs(os.path.dirname(os.path.abspath(filename)))
+        self.filename = filename
+        self.flush_every = flush_every
+        self.enabled = True
+        self.total_histograms = {}
+        self.total_counters = {}
+        self.reset()
+
+    def disable(self):
+        self.flush()
+        self.enabled = False
+
+    def span(self, name):
+        if self.enabled:
+            return Span(self, name)
+        else:
+            return null_span
+
+    def observe(self, name, value):
+        if self.enabled:
+            for histograms in [self.histograms, self.total_histograms]:
+                if name not in histograms:
+                    histograms[name] = Histogram()
+                histograms[name].add(value)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+            self.total_counters[name] = self.total_counters.get(name, 0) + n
+
+    def tick(self):
+        """ To be called once per iteration: flushes if flush_every seconds elapsed """
+        if self.enabled and clock() - self.last_flush > self.flush_every:
+            self.flush()
+
+    def save(self):
+        return dict(spans={name: h.save() for name, h in self.histograms.items()},
+                    counters=self.counters.copy())
+
+    def flush(self):
+        if self.enabled and self.filename is not None:
+            record = self.save()
+            record["time"] = clock()
+            with open(self.filename, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        self.reset()
+
+    def print_stats(self):
+        print "\n-------\nMetrics\n-------\n"
+        for name in sorted(self.total_histograms.keys()):
+            h = self.total_histograms[name]
+            print "%-28s n=%-8d mean %8.3f ms   max %8.3f ms   total %8.2f s" % (name, h.count, 1000. * h.total / h.count, 1000. * h.max, h.total)
+        for name in sorted(self.total_counters.keys()):
+            print "%-28s %d" % (name, self.total_counters[name])
+        print
+
+
+def load_metrics(filename):
+    """ Load the list of records flushed to filename """
+    with open(filename, 'r') as f:
+        return [json.loads(line) for line in f]
+
+
+metrics = Metrics()
@@ -0,0 +1,53 @@
+import hashlib
+import numpy as np
+
+
+# Random streams are derived from a trial seed and a path of keys, e.g.
+# make_rng(seed, "agent", "mod1") or make_rng(seed, "worker", i), so that each
+# component and worker gets an independent and reproducible stream.
+# Without a seed, components use the global numpy random state as before.
+
+
+def derive_seed(seed, *keys):
+    digest = hashlib.md5(repr((seed,) + keys)).digest()
+    return np.frombuffer(digest, dtype=np.uint32)
+
+
+def make_rng(seed=None, *keys):
+    """ RandomState of the stream keys derived from seed, or the global numpy random state if seed is None """
+    if seed is None:
+        return np.random
+    return np.random.RandomState(derive_seed(seed, *keys))
+
+
+def spawn_rng(rng):
+    """ Independent child stream of rng (the global numpy random state spawns itself) """
+    if rng is np.random:
+        return rng
+    return np.random.RandomState(rng.randint(0, 2**32, size=4, dtype=np.uint32))
+
+
+# Versions of explauto.utils functions drawing from rng
+
+def rand_bounds(bounds, n=1, rng=np.random):
+    widths = np.tile(bounds[1, :] - bounds[0, :], (n, 1))
+    return widths * rng.rand(n, bounds.shape[1]) + np.tile(bounds[0, :], (n, 1))
+
+
+def prop_choice(v, eps=0., rng=np.random):
+    if np.sum(v) == 0 or rng.rand() < eps:
+        return rng.randint(np.size(v))
+    else:
+        probas = np.array(v) / np.sum(v)
+        return np.where(rng.multinomial(1, probas) == 1)[0][0]
+
+
+def softmax_choice(v, temperature=1., rng=np.random):
+    if np.sum(v) == 0:
+        return rng.randint(np.size(v))
+    else:
+        v = np.array(v)
+        vmax = max(v)
+        probas = np.exp((v-vmax) / temperature)
+        probas = probas / np.sum(probas)
+        return np.where(rng.multinomial(1, probas) == 1)[0][0]
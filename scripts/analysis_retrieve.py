@@ -3,6 +3,10 @@ import sys
 import cPickle
 import numpy as np
 
+sys.path.append('../')
+
+from cogsci2017.learning.run_recorder import chosen_module_counts
+
 
 
 # PARAMS
@@ -39,9 +43,10 @@ for config_name in config_list:
             
             # COMPETENCE
             data_competence[config_name][trial]["eval_results"] = log["eval_results"]
+            data_competence[config_name][trial]["eval_version"] = log.get("eval_version", 1)
             
             # PROGRESS
-            data_progress[config_name][trial]["chosen_modules"] = {mid: log["agent"]["chosen_modules"].count(mid) for mid in log["agent"]["pp_evolution"].keys()}
+            data_progress[config_name][trial]["chosen_modules"] = chosen_module_counts(log["agent"])
             data_progress[config_name][trial]["cp_evolution"] = {}
             for mid in log["agent"]["cp_evolution"].keys():
                 data_progress[config_name][trial]["cp_evolution"][mid] = log["agent"]["cp_evolution"][mid]
@@ -0,0 +1,332 @@
+import os
+import sys
+import json
+import time
+import random
+import cPickle
+import argparse
+import traceback
+from distutils.spawn import find_executable
+import numpy as np
+from timeit import default_timer as clock
+
+sys.path.append('../')
+
+from explauto.utils.config import make_configuration
+from cogsci2017.dmp.mydmp import MyDMP
+from cogsci2017.environment.arm_env import ArmEnvironment
+from cogsci2017.learning.sensorimotor_model import DemonstrableNN
+from cogsci2017.learning.interest_model import MiscRandomInterest
+from cogsci2017.learning.supervisor import Supervisor
+from cogsci2017.learning.run_recorder import RunRecorder
+
+
+# Benchmarks of the hot paths, with fixed seeds and warmup.
+# usage: python benchmark.py [--out results.json] [--baseline baseline.json] [--tolerance 1.25] [--only name_prefix]
+# The time per call of each case is the median over repeats. Cases needing ROS, Octave or
+# DIVA are skipped when these are not installed. The script exits with status 1 if a case
+# fails, or with --baseline, if a case is slower than tolerance times its baseline.
+
+
+SEED = 0
+
+
+def ros_available():
+    try:
+        import rospy
+        import brewer2mpl
+        from rospkg import RosPack, ResourceNotFound
+    except ImportError:
+        return False
+    try:
+        RosPack().get_path('pobax_playground')
+    except ResourceNotFound:
+        return False
+    return True
+
+
+def octave_available():
+    try:
+        import oct2py
+    except ImportError:
+        return False
+    return any(find_executable(name) for name in [os.environ.get('OCTAVE_EXECUTABLE', 'octave-cli'), 'octave'])
+
+
+def diva_available():
+    return os.path.exists(os.path.join(os.getenv("HOME"), 'software/DIVAsimulink/'))
+
+
+requirements = dict(ROS=ros_available, Octave=octave_available, DIVA=diva_available)
+
+
+def seed(s=SEED):
+    np.random.seed(s)
+    random.seed(s)
+
+
+def arm_env():
+    return ArmEnvironment(m_mins=[-1.] * 3 * 7,
+                          m_maxs=[1.] * 3 * 7,
+                          s_mins=[-1.] * 3 * 50,
+                          s_maxs=[1.] * 3 * 50,
+                          lengths=[0.5, 0.3, 0.2],
+                          angle_shift=0.5,
+                          rest_state=[0., 0., 0.],
+                          n_dmps=3,
+                          n_bfs=6,
+                          timesteps=50)
+
+
+class StandInSynth(object):
+    """ Deterministic replacement of DivaSynth: smooth formants computed from the articulators """
+    def __init__(self):
+        rng = np.random.RandomState(SEED)
+        self.W = rng.uniform(-0.2, 0.2, (4, 13))
+        self.f = np.array([120., 500., 1500., 2500.])
+
+    def execute(self, art):
+        return self.f[:, None] * np.exp(np.dot(self.W, art)),
+
+
+class StandInEnvironment(object):
+    """ Sensory effects of the 49D motor space without the ROS and Octave dependencies """
+    def __init__(self):
+        rng = np.random.RandomState(SEED)
+        self.arm = arm_env()
+        self.W_diva = rng.uniform(-0.3, 0.3, (28, 50))
+        self.context = rng.uniform(-1., 1., 6)
+
+    def update(self, m):
+        m = np.array(m)
+        if np.linalg.norm(m[:21]) > 0:
+            hand = self.arm.compute_sensori_effect(m[:21])[[0, 12, 24, 37, 49], :2] / 2.
+            s = np.hstack((self.context, hand.T.flatten(), np.zeros(40)))
+        else:
+            sound = np.tanh(np.dot(m[21:], self.W_diva))
+            s = np.hstack((self.context, np.zeros(30), sound[:10], np.zeros(10)))
+        return np.clip(s, -1., 1.)
+
+
+def make_nn(n, m_ndims=21, s_ndims=10, fwd='NN', inv='NN'):
+    seed()
+    conf = make_configuration([-1.] * m_ndims, [1.] * m_ndims, [-1.] * s_ndims, [1.] * s_ndims)
+    sm = DemonstrableNN(conf, fwd=fwd, inv=inv, sigma_explo_ratio=0.1)
+    W = np.random.uniform(-1., 1., (m_ndims, s_ndims))
+    m = np.random.uniform(-1., 1., (n, m_ndims))
+    s = np.tanh(np.dot(m, W))
+    sm.forward([list(m), list(s)], n)
+    sm.mode = 'explore'
+    return sm, conf
+
+
+# CASES: name -> (setup, run, n calls per repeat)
+
+def case_dmp_rollout():
+    dmp = MyDMP(n_dmps=3, n_bfs=6, timesteps=50, max_params=np.array([300.] * 18 + [1.] * 3))
+    ms = np.random.uniform(-1., 1., (100, 21)) * dmp.max_params
+    return lambda: [dmp.trajectory(m) for m in ms], len(ms)
+
+
+def case_arm_kinematics():
+    env = arm_env()
+    trajs = [env.compute_traj(m) for m in np.random.uniform(-1., 1., (100, 21))]
+    return lambda: [env.compute_kinematics(traj) for traj in trajs], len(trajs)
+
+
+def case_interaction_loop():
+    from cogsci2017.environment.arm_diva_env import CogSci2017Environment
+    env = CogSci2017Environment()
+    trajs = [env.arm.compute_sensori_effect(m) for m in np.random.uniform(-1., 1., (20, 21))]
+    def run():
+        for traj in trajs:
+            env.purge_logs()
+            env.reset()
+            env.compute_interaction(traj, "arm")
+    return run, len(trajs)
+
+
+def case_diva_synth_standin():
+    synth = StandInSynth()
+    dmp = MyDMP(n_dmps=7, n_bfs=2, timesteps=50, use_init=True, max_params=np.array([1.] * 7 + [300.] * 14 + [1.] * 7))
+    ms = np.random.uniform(-1., 1., (100, 28)) * dmp.max_params
+    def run():
+        for m in ms:
+            art_traj = np.zeros((13, 50))
+            art_traj[10:, :] = 1.
+            art_traj[:7, :] = np.clip(dmp.trajectory(m), -1., 1.).T
+            res = synth.execute(2. * art_traj)[0]
+            formants = np.log2(np.transpose(res[1:3, :]))
+            formants[np.isnan(formants)] = 0.
+    return run, len(ms)
+
+
+def case_diva_synth_real():
+    from cogsci2017.environment.diva import DivaSynth
+    synth = DivaSynth()
+    arts = [np.random.uniform(-1., 1., (13, 50)) for _ in range(10)]
+    return lambda: [synth.execute(art) for art in arts], len(arts)
+
+
+def nn_case(n, direction):
+    def case():
+        sm, conf = make_nn(n)
+        if direction == "inverse":
+            xs = np.random.uniform(-1., 1., (100, conf.s_ndims))
+            return lambda: [sm.infer(conf.s_dims, conf.m_dims, x) for x in xs], len(xs)
+        elif direction == "forward":
+            xs = np.random.uniform(-1., 1., (100, conf.m_ndims))
+            return lambda: [sm.infer(conf.m_dims, conf.s_dims, x) for x in xs], len(xs)
+        else:
+            # add one point then query: the kd-tree is rebuilt as in the learning loop
+            ms = np.random.uniform(-1., 1., (10, conf.m_ndims))
+            ss = np.random.uniform(-1., 1., (10, conf.s_ndims))
+            def run():
+                for m, s in zip(ms, ss):
+                    sm.update(m, s)
+                    sm.infer(conf.s_dims, conf.m_dims, s)
+            return run, len(ms)
+    return case
+
+
+def case_fast_lwlr_forward():
+    sm, conf = make_nn(10000, fwd='fast-LWLR', inv='NN')
+    xs = np.random.uniform(-1., 1., (100, conf.m_ndims))
+    return lambda: [sm.infer(conf.m_dims, conf.s_dims, x) for x in xs], len(xs)
+
+
+def case_fast_opt_inverse_batch():
+    sm, conf = make_nn(10000, fwd='fast-LWLR', inv='fast-opt')
+    xs = np.random.uniform(-1., 1., (100, conf.s_ndims))
+    return lambda: sm.infer_order_batch(xs), len(xs)
+
+
+def case_interest_update():
+    conf = make_configuration([-1.] * 21, [1.] * 21, [-1.] * 10, [1.] * 10)
+    im = MiscRandomInterest(conf, conf.s_dims, win_size=1000, competence_mode='knn', k=20, progress_mode='local')
+    for _ in range(1000):
+        x = np.random.uniform(-1., 1., 31)
+        im.update(x, x + np.random.normal(0., 0.1, 31), np.random.uniform(-1., 1., 10))
+    xs = np.random.uniform(-1., 1., (20, 31))
+    sps = np.random.uniform(-1., 1., (20, 10))
+    return lambda: [im.update(x, x, sp) for x, sp in zip(xs, sps)], len(xs)
+
+
+def case_iteration():
+    env = StandInEnvironment()
+    config = dict(m_mins=np.array([-1.] * 49), m_maxs=np.array([1.] * 49),
+                  s_mins=np.array([-1.] * 56), s_maxs=np.array([1.] * 56))
+    agent = Supervisor(config, model_babbling="random", n_motor_babbling=100)
+    for _ in range(800):
+        agent.perceive(env.update(agent.produce(env.context)))
+    def run():
+        for _ in range(20):
+            agent.perceive(env.update(agent.produce(env.context)))
+    return run, 20
+
+
+def case_log_writing():
+    n = 80000
+    mids = ['mod1', 'mod2', 'mod3', 'mod6', 'mod10', 'mod13']
+    recorder = RunRecorder(mids, mids, size=n)
+    for i in np.random.randint(0, 6, n):
+        recorder.choose(mids[i])
+    for _ in range(n / 100):
+        recorder.record_progress(dict(zip(mids, np.random.rand(6))), dict(zip(mids, np.random.rand(6))))
+    log = dict(agent=recorder.save(),
+               environment=dict(best_vocal_errors_evolution=[{hs: np.random.rand() for hs in ['eyu', 'oey', 'eou', 'oyi']} for _ in range(n / 100)]))
+    filename = '/tmp/cogsci2017-benchmark-{}.pickle'.format(os.getpid())
+    def run():
+        with open(filename, 'wb') as f:
+            cPickle.dump(log, f, cPickle.HIGHEST_PROTOCOL)
+        os.remove(filename)
+    return run, 1
+
+
+cases = [("dmp_rollout", case_dmp_rollout),
+         ("arm_kinematics", case_arm_kinematics),
+         ("interaction_loop", case_interaction_loop),
+         ("diva_synth_standin", case_diva_synth_standin),
+         ("diva_synth_real", case_diva_synth_real)] + \
+        [("nn_{}_{}k".format(direction, n / 1000), nn_case(n, direction)) for direction in ["inverse", "forward", "update"] for n in [1000, 10000, 100000]] + \
+        [("fast_lwlr_forward_10k", case_fast_lwlr_forward),
+         ("fast_opt_batch_10k", case_fast_opt_inverse_batch),
+         ("interest_update", case_interest_update),
+         ("iteration", case_iteration),
+         ("log_writing", case_log_writing)]
+
+# external dependencies of the cases (default: none)
+case_requirements = dict(interaction_loop=["ROS", "Octave", "DIVA"],
+                         diva_synth_real=["Octave", "DIVA"])
+
+
+def benchmark(case, warmup=2, repeats=7):
+    seed()
+    run, n_calls = case()
+    for _ in range(warmup):
+        run()
+    times = []
+    for _ in range(repeats):
+        t0 = clock()
+        run()
+        times.append((clock() - t0) / n_calls)
+    return dict(median=float(np.median(times)), min=float(np.min(times)), repeats=repeats, calls=n_calls)
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print
+    print "%-24s %12s %12s %8s" % ("case", "baseline", "current", "ratio")
+    for name, res in sorted(results.items()):
+        if name in baseline:
+            ratio = res["median"] / baseline[name]["median"]
+            print "%-24s %10.3fms %10.3fms %8.2f%s" % (name, 1000. * baseline[name]["median"], 1000. * res["median"], ratio, " REGRESSION" if ratio > tolerance else "")
+            if ratio > tolerance:
+                regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--out', default=None)
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    parser.add_argument('--only', default="")
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+    for name, case in cases:
+        if not name.startswith(args.only):
+            continue
+        missing = [r for r in case_requirements.get(name, []) if not requirements[r]()]
+        if missing:
+            print "%-24s skipped (no %s)" % (name, ", ".join(missing))
+            continue
+        try:
+            results[name] = benchmark(case)
+            print "%-24s %10.3f ms" % (name, 1000. * results[name]["median"])
+        except Exception:
+            traceback.print_exc()
+            print "%-24s FAILED" % name
+            failures.append(name)
+
+    report = dict(date=time.strftime("%Y-%m-%d %H:%M:%S"), seed=SEED, results=results, failures=failures)
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print
+            print "Regressions:", ", ".join(regressions)
+            sys.exit(1)
+
+    if failures:
+        print
+        print "Failures:", ", ".join(failures)
+        sys.exit(1)
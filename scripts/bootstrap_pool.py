@@ -0,0 +1,50 @@
+import sys
+from numpy.lib.format import open_memmap
+
+sys.path.append('../')
+
+from cogsci2017.environment.arm_diva_env import CogSci2017Environment
+from cogsci2017.learning.supervisor import Supervisor
+from cogsci2017.rng import make_rng
+
+
+# Pre-generate a pool of motor babbling samples (m+s vectors, as Supervisor.motor_babbling
+# and the environment produce them in the first iterations of a run, followed by the 10
+# unnormalized formants of the sound, for CogSci2017Environment.replay) into a .npy file,
+# from which run.py can draw the bootstrap of each trial (see BootstrapPool).
+# usage: python bootstrap_pool.py <pool_file> <n_samples> [seed]
+
+
+def generate(filename, n_samples, seed=None, flush_every=1000):
+
+    environment = CogSci2017Environment(gui=False, audio=False, rng=make_rng(seed, "environment"))
+
+    config = dict(m_mins=environment.conf.m_mins,
+                 m_maxs=environment.conf.m_maxs,
+                 s_mins=environment.conf.s_mins,
+                 s_maxs=environment.conf.s_maxs,
+                 s_layout=environment.s_layout)
+
+    agent = Supervisor(config, n_motor_babbling=n_samples, rng=make_rng(seed, "agent"))
+    environment.s_out = agent.s
+
+    ndims = agent.conf.ndims
+    pool = open_memmap(filename, mode='w+', dtype=agent.ms.dtype, shape=(n_samples, ndims + 10))
+    for i in range(n_samples):
+        environment.update(agent.motor_babbling())
+        pool[i, :ndims] = agent.ms
+        pool[i, ndims:] = environment.sound
+        if (i + 1) % flush_every == 0:
+            pool.flush()
+            print "Samples", i + 1
+    pool.flush()
+    environment.print_stats()
+
+
+if __name__ == "__main__":
+
+    filename = sys.argv[1]
+    n_samples = int(sys.argv[2])
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    generate(filename, n_samples, seed)
@@ -0,0 +1,19 @@
+import sys
+
+sys.path.append('../')
+
+from cogsci2017.environment.diva.synth_server import SynthServer
+
+
+# Node-local DIVA synthesis server: the trials started with DIVA_SYNTH_SERVER=<address>
+# in their environment share its n_backends Octave sessions.
+# usage: python diva_server.py <address> [n_backends] [max_batch]
+
+
+if __name__ == "__main__":
+
+    address = sys.argv[1]
+    n_backends = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    max_batch = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+
+    SynthServer(address, n_backends=n_backends, max_batch=max_batch).serve_forever()
@@ -1,65 +1,209 @@
 import os
 import sys
-import subprocess
+import json
 import time
+import socket
 import datetime
-import cPickle
-import json
-import base64
-import numpy as np
+import subprocess
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+sys.path.append('../')
+
+from cogsci2017.rng import derive_seed
+
+
+# Trials are packed by trials_per_job in the jobs of one PBS job array: each job runs
+# its trials (python run.py <log_dir> <config> <trial> <seed>) with a pool of processes sized
+# to the allocated cores. The status of each trial is written in <log_dir>/manifest/,
+# so that submitting again to the same log_dir only runs the trials neither complete nor
+# running (unless --force: also the running ones, e.g. after their job was killed).
+# Each submission has its own list of trials (<log_dir>/trials-<date>.json), so that the
+# queued jobs of a previous submission still run their own trials.
+# The seed of a trial is derived from seed and the trial number (the same for all configs).
+#
+# usage: python pbs_xp.py submit <pool_name or existing log_dir> [trials_per_job] [local] [--force]
+#        python pbs_xp.py pack <log_dir> <trials_file> <job_index>     (run by each job of the array)
+#        python pbs_xp.py status <log_dir>
+# local: the jobs are run one after the other as subprocesses instead of submitted.
 
 
 # CONFIGS
 config_list = ["RMB", "AMB"]
 
 n_trial = 500
+trials_per_job = 8
+seed = 0
 
+walltime = "04:00:00" # per trial: multiplied by the number of trials per process of a job
+ppn = 8
+synth_backends = 0 # > 0: the trials of a job share a DIVA synthesis server with synth_backends Octave sessions
 
-path = '/home/sforestier/software/CogSci2017/scripts/'
-start_date = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-pool_name = sys.argv[1]
+path = os.path.dirname(os.path.abspath(__file__))
+log_root = os.environ.get('COGSCI2017_LOG_ROOT', '/scratch/sforestier001/logs/CogSci2017/')
 
 
-def write_pbs(config_name, trial, log_dir):
-    pbs =   """
-#!/bin/sh
+def trial_name(config_name, trial):
+    return '{}-{}'.format(config_name, trial)
 
-#PBS -l walltime=04:00:00
-#PBS -l nodes=1:ppn=2
-#PBS -N {}-{}
-#PBS -o {}logs/log-{}-{}.output
-#PBS -e {}logs/log-{}-{}.error
 
-cd {}
-time python run.py {} {} {}
+def status_file(log_dir, config_name, trial):
+    return os.path.join(log_dir, 'manifest', trial_name(config_name, trial) + '.json')
+
+
+def write_json(filename, data):
+    with open(filename + '.tmp', 'wb') as f:
+        json.dump(data, f, indent=1)
+    os.rename(filename + '.tmp', filename)
+
+
+def read_status(log_dir, config_name, trial):
+    filename = status_file(log_dir, config_name, trial)
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'rb') as f:
+        return json.load(f)
 
-""".format(config_name, trial, log_dir, config_name, trial, log_dir, config_name, trial, path, log_dir, config_name, trial)
-    filename = '{}-{}.pbs'.format(config_name, trial)
-    with open(log_dir + "pbs/" + filename, 'wb') as f:
-        f.write(pbs)
 
+def trial_seed(trial):
+    return int(derive_seed(seed, "trial", trial)[0])
 
-log_dir = '/scratch/sforestier001/logs/CogSci2017/' + start_date + '-' + pool_name
 
+def is_complete(log_dir, config_name, trial):
+    status = read_status(log_dir, config_name, trial)
+    pickle = os.path.join(log_dir, 'pickle', 'log-{}.pickle'.format(trial_name(config_name, trial)))
+    return status is not None and status["status"] == "done" and os.path.exists(pickle)
 
 
-trial_list = range(1,n_trial + 1) 
+def to_run(log_dir, config_name, trial, force=False):
+    """ Not complete, and not running unless force """
+    if is_complete(log_dir, config_name, trial):
+        return False
+    status = read_status(log_dir, config_name, trial)
+    return force or status is None or status["status"] != "running"
 
 
-os.mkdir(log_dir + "/")
-os.mkdir(log_dir + "/" + "pbs")
-os.mkdir(log_dir + "/" + "img")
-os.mkdir(log_dir + "/" + "logs")
-os.mkdir(log_dir + "/" + "pickle")
-#os.mkdir(log_dir + "/" + "configs")
-    
-    
-    
-for trial in trial_list:
+def manifest(log_dir):
+    """ Status of all the trials (trial name: status dict), also written in <log_dir>/manifest.json """
+    trials = {}
     for config_name in config_list:
-        print config_name, trial
-        write_pbs(config_name, trial, log_dir + "/")   
-        filename = '{}-{}.pbs'.format(config_name, trial)
-        print "qsub " + log_dir + "/pbs/" + filename
-        process = subprocess.Popen("qsub " + log_dir + "/pbs/" + filename, shell=True, stdout=subprocess.PIPE)
-        time.sleep(0.2)
+        for trial in range(1, n_trial + 1):
+            status = read_status(log_dir, config_name, trial)
+            trials[trial_name(config_name, trial)] = status if status is not None else dict(status="pending")
+    write_json(os.path.join(log_dir, 'manifest.json'), trials)
+    return trials
+
+
+def run_trial(args):
+    log_dir, config_name, trial, env = args
+    filename = status_file(log_dir, config_name, trial)
+    status = dict(status="running", host=socket.gethostname(), job=os.environ.get('PBS_JOBID'), start=time.time(), seed=trial_seed(trial))
+    write_json(filename, status)
+    with open(os.path.join(log_dir, 'logs', 'log-{}.output'.format(trial_name(config_name, trial))), 'wb') as out, \
+         open(os.path.join(log_dir, 'logs', 'log-{}.error'.format(trial_name(config_name, trial))), 'wb') as err:
+        returncode = subprocess.call([sys.executable, 'run.py', log_dir, config_name, str(trial), str(status["seed"])], cwd=path, stdout=out, stderr=err, env=env)
+    status.update(status="done" if returncode == 0 else "failed", returncode=returncode, duration=time.time() - status["start"])
+    write_json(filename, status)
+    return config_name, trial, status["status"]
+
+
+def n_cores():
+    for var in ['PBS_NUM_PPN', 'PBS_NP', 'NCPUS']:
+        if os.environ.get(var):
+            return int(os.environ[var])
+    return multiprocessing.cpu_count()
+
+
+def pack(log_dir, trials_file, job_index):
+    with open(os.path.join(log_dir, trials_file), 'rb') as f:
+        submission = json.load(f)
+    k = submission["trials_per_job"]
+    trials = [(config_name, trial) for config_name, trial in submission["trials"][job_index * k:(job_index + 1) * k]
+              if to_run(log_dir, config_name, trial, submission["force"])]
+    env = dict(os.environ)
+    server = None
+    if synth_backends > 0 and len(trials) > 0:
+        address = os.path.join('/tmp', 'diva-{}-{}.sock'.format(os.getpid(), job_index))
+        server = subprocess.Popen([sys.executable, 'diva_server.py', address, str(synth_backends)], cwd=path)
+        while not os.path.exists(address) and server.poll() is None:
+            time.sleep(0.1)
+        env['DIVA_SYNTH_SERVER'] = address
+    pool = ThreadPool(min(n_cores(), max(len(trials), 1)))
+    for config_name, trial, status in pool.imap_unordered(run_trial, [(log_dir, config_name, trial, env) for config_name, trial in trials]):
+        print config_name, trial, status
+    pool.close()
+    pool.join()
+    if server is not None:
+        server.terminate()
+
+
+def write_pbs(log_dir, trials_file, n_jobs, k):
+    n_procs = min(ppn, k)
+    hours = int(walltime.split(':')[0]) * ((k + n_procs - 1) / n_procs)
+    pbs = """#!/bin/sh
+
+#PBS -l walltime={}:{}
+#PBS -l nodes=1:ppn={}
+#PBS -t 0-{}
+#PBS -N CogSci2017
+#PBS -o {}/logs/job.output
+#PBS -e {}/logs/job.error
+
+cd {}
+python pbs_xp.py pack {} {} $PBS_ARRAYID
+
+""".format(hours, walltime.split(':', 1)[1], n_procs, n_jobs - 1, log_dir, log_dir, path, log_dir, trials_file)
+    filename = os.path.join(log_dir, 'pbs', os.path.splitext(trials_file)[0] + '.pbs')
+    with open(filename, 'wb') as f:
+        f.write(pbs)
+    return filename
+
+
+def submit(name, k=trials_per_job, local=False, force=False):
+    start_date = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    if os.path.isdir(name):
+        log_dir = os.path.abspath(name)
+    else:
+        log_dir = os.path.join(log_root, start_date + '-' + name)
+    for d in ['', 'pbs', 'img', 'logs', 'pickle', 'manifest']:
+        if not os.path.exists(os.path.join(log_dir, d)):
+            os.makedirs(os.path.join(log_dir, d))
+
+    trials = [(config_name, trial) for trial in range(1, n_trial + 1) for config_name in config_list
+              if to_run(log_dir, config_name, trial, force)]
+    n_jobs = (len(trials) + k - 1) / k
+    print len(trials), "trials to run in", n_jobs, "jobs,", log_dir
+    if n_jobs == 0:
+        return log_dir
+    trials_file = 'trials-{}.json'.format(start_date)
+    write_json(os.path.join(log_dir, trials_file), dict(trials=trials, trials_per_job=k, force=force))
+
+    if local:
+        for job_index in range(n_jobs):
+            subprocess.call([sys.executable, 'pbs_xp.py', 'pack', log_dir, trials_file, str(job_index)], cwd=path)
+        manifest(log_dir)
+    else:
+        filename = write_pbs(log_dir, trials_file, n_jobs, k)
+        print "qsub " + filename
+        subprocess.call(["qsub", filename])
+    return log_dir
+
+
+if __name__ == "__main__":
+
+    force = "--force" in sys.argv
+    args = [arg for arg in sys.argv if arg != "--force"]
+    command = args[1]
+    if command == "submit":
+        submit(args[2],
+               int(args[3]) if len(args) > 3 else trials_per_job,
+               len(args) > 4 and args[4] == "local",
+               force)
+    elif command == "pack":
+        pack(args[2], args[3], int(args[4]))
+    elif command == "status":
+        trials = manifest(sys.argv[2])
+        for status in ["done", "running", "failed", "pending"]:
+            print status, sum(t["status"] == status for t in trials.values())
+    else:
+        raise NotImplementedError
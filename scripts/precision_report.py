@@ -0,0 +1,69 @@
+import sys
+import numpy as np
+
+sys.path.append('../')
+
+from cogsci2017.environment.arm_env import ArmEnvironment
+from cogsci2017.dmp.mydmp import MyDMP
+
+
+# Compare float32 results with the float64 reference on random motor commands:
+# arm trajectories and kinematics, and vocal DMP trajectories (without DIVA synthesis).
+
+n = 1000
+tol = 0.2
+seed = 0
+
+
+def arm_env(dtype):
+    return ArmEnvironment(m_mins=[-1.] * 3 * 7,
+                          m_maxs=[1.] * 3 * 7,
+                          s_mins=[-1.] * 3 * 50,
+                          s_maxs=[1.] * 3 * 50,
+                          lengths=[0.5, 0.3, 0.2],
+                          angle_shift=0.5,
+                          rest_state=[0., 0., 0.],
+                          n_dmps=3,
+                          n_bfs=6,
+                          timesteps=50,
+                          dtype=dtype)
+
+
+def diva_dmp(dtype):
+    max_params = np.array([1.] * 7 + [300.] * 2 * 7 + [1.] * 7)
+    return MyDMP(n_dmps=7, n_bfs=2, timesteps=50, use_init=True, max_params=max_params, dtype=dtype)
+
+
+def report(name, ref, res):
+    err = np.abs(np.array(res, dtype=np.float64) - np.array(ref))
+    print "%-24s max %.2e   mean %.2e   > tol: %d / %d" % (name, err.max(), err.mean(), np.sum(err.max(axis=(1, 2)) > tol), len(err))
+
+
+rng = np.random.RandomState(seed)
+m_arm = rng.uniform(-1., 1., (n, 21))
+m_diva = rng.uniform(-1., 1., (n, 28))
+
+arm64, arm32 = arm_env(np.float64), arm_env(np.float32)
+dmp64, dmp32 = diva_dmp(np.float64), diva_dmp(np.float32)
+
+traj64 = [arm64.compute_traj(m) for m in m_arm]
+traj32 = [arm32.compute_traj(m) for m in m_arm]
+hand64 = [arm64.compute_sensori_effect(m) for m in m_arm]
+hand32 = [arm32.compute_sensori_effect(m) for m in m_arm]
+diva64 = [dmp64.trajectory(m * dmp64.max_params) for m in m_diva]
+diva32 = [dmp32.trajectory(m.astype(np.float32) * dmp32.max_params.astype(np.float32)) for m in m_diva]
+
+print
+print "Precision report: float32 vs float64,", n, "random commands, tolerance", tol
+print
+report("Arm joint trajectories", traj64, traj32)
+print "  (dtype: %s)" % traj32[0].dtype
+report("Hand x, y, angle", hand64, hand32)
+print "  (dtype: %s)" % hand32[0].dtype
+report("Vocal DMP trajectories", diva64, diva32)
+print "  (dtype: %s)" % diva32[0].dtype
+print
+ms_dims = 49 + 56
+for dtype in [np.float64, np.float32]:
+    print "Dataset memory for 100k (m, s) points in %s: %.1f MB" % (np.dtype(dtype).name, 1e5 * ms_dims * np.dtype(dtype).itemsize / 1e6)
+print
@@ -0,0 +1,66 @@
+import os
+import sys
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.animation as animation
+
+sys.path.append('../')
+
+from cogsci2017.environment.recorder import load_episodes
+from cogsci2017.environment.renderer import WorldView
+
+import brewer2mpl
+bmap = brewer2mpl.get_map('Dark2', 'qualitative', 6)
+colors = bmap.mpl_colors
+
+colors_config = {
+                 "stick":colors[1],
+                 "gripper":colors[1],
+                 "magnetic":colors[2],
+                 }
+
+
+# Render the episodes recorded by EpisodeRecorder (CogSci2017Environment(recorder=...))
+# usage: python replay.py <recorder_file> <out_dir> [png|mp4] [step_every]
+
+
+def replay(filename, out_dir, fmt="png", step_every=1, lengths=[0.5, 0.3, 0.2], angle_shift=0.5, fps=25):
+
+    if not os.path.exists(out_dir):
+        os.mkdir(out_dir)
+
+    episodes = load_episodes(filename)
+    view = WorldView(lengths, angle_shift, colors_config, colors[3], animated=False)
+
+    for episode in episodes:
+        print "Render episode", episode['episode']
+        steps = range(0, len(episode['arm']), step_every)
+
+        def draw(i):
+            tool = episode['tool'][i]
+            view.set_state(episode['arm'][i], tool[:2], tool[3:5], episode['toy1'][i], episode['caregiver'][i])
+
+        if fmt == "png":
+            for i in steps:
+                draw(i)
+                view.fig.savefig(os.path.join(out_dir, 'episode-{}-{:03d}.png'.format(episode['episode'], i)))
+        elif fmt == "mp4":
+            writer = animation.FFMpegWriter(fps=fps)
+            with writer.saving(view.fig, os.path.join(out_dir, 'episode-{}.mp4'.format(episode['episode'])), 100):
+                for i in steps:
+                    draw(i)
+                    writer.grab_frame()
+        else:
+            raise NotImplementedError
+
+    view.close()
+
+
+if __name__ == "__main__":
+
+    filename = sys.argv[1]
+    out_dir = sys.argv[2]
+    fmt = sys.argv[3] if len(sys.argv) > 3 else "png"
+    step_every = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+
+    replay(filename, out_dir, fmt, step_every)
@@ -8,10 +8,18 @@ sys.path.append('../')
 
 from cogsci2017.environment.arm_diva_env import CogSci2017Environment
 from cogsci2017.learning.supervisor import Supervisor
+from cogsci2017.learning.bootstrap_pool import BootstrapPool
+from cogsci2017.metrics import metrics
+from cogsci2017.evaluation import CompetenceEvaluation, BackgroundEvaluation, eval_results as competence_eval_results, version as eval_version
+from cogsci2017.rng import make_rng
   
 
 
-def run(log_dir, config_name, trial):
+def make_environment():
+    return CogSci2017Environment(gui=False, audio=False)
+
+
+def run(log_dir, config_name, trial, seed=None, bootstrap_pool=None):
     
     if not os.path.exists(log_dir):
         os.mkdir(log_dir)
@@ -27,6 +35,11 @@ def run(log_dir, config_name, trial):
         proba_imitate = 0.5
         gui=False
         audio=False
+        profile=False
+        eval_every = None # iterations between competence evaluations during training
+        eval_workers = 0
+        eval_fork = False # evaluate in forked children while learning continues
+        eval_children = 1
         
     elif config_name == "AMB":
         
@@ -37,6 +50,11 @@ def run(log_dir, config_name, trial):
         proba_imitate = 0.5
         gui=False
         audio=False
+        profile=False
+        eval_every = None # iterations between competence evaluations during training
+        eval_workers = 0
+        eval_fork = False # evaluate in forked children while learning continues
+        eval_children = 1
         
     else:
         raise NotImplementedError
@@ -45,17 +63,37 @@ def run(log_dir, config_name, trial):
     
     
     # INITIALIZE
-    environment = CogSci2017Environment(gui=gui, audio=audio)
+    if seed is not None:
+        # remaining explauto code paths use the global numpy random state
+        np.random.seed(make_rng(seed, "global").randint(2**31))
+    
+    if profile:
+        metrics.enable(log_dir + '/metrics/metrics-{}-{}'.format(config_name, trial) + '.jsonl')
+    
+    environment = CogSci2017Environment(gui=gui, audio=audio, rng=make_rng(seed, "environment"))
     
     config = dict(m_mins=environment.conf.m_mins,
                  m_maxs=environment.conf.m_maxs,
                  s_mins=environment.conf.s_mins,
-                 s_maxs=environment.conf.s_maxs)
+                 s_maxs=environment.conf.s_maxs,
+                 s_layout=environment.s_layout)
     
-    agent = Supervisor(config, model_babbling=model_babbling, n_motor_babbling=n_motor_babbling, explo_noise=explo_noise, proba_imitate=proba_imitate)
+    agent = Supervisor(config, model_babbling=model_babbling, n_motor_babbling=n_motor_babbling, explo_noise=explo_noise, proba_imitate=proba_imitate, rng=make_rng(seed, "agent"), record_size=iterations)
+    environment.s_out = agent.s # the environment writes s in the agent's m+s buffer
+    
+    evaluation = CompetenceEvaluation(n_goals=100, n_workers=eval_workers, make_env=make_environment, rng=make_rng(seed, "evaluation"))
+    evaluations = []
+    if eval_every and eval_fork:
+        background = BackgroundEvaluation(evaluation, log_dir + '/evaluations/{}-{}'.format(config_name, trial), max_children=eval_children)
+    else:
+        background = None
     
     t0 = time.time()
     
+    if bootstrap_pool is not None:
+        # motor babbling samples drawn from a pre-generated pool instead of simulated
+        environment.replay(agent.bootstrap(BootstrapPool(bootstrap_pool)))
+    
     count_social_tool_1 = []
     count_social_tool_2 = []
     count_social_tool_3 = []
@@ -65,13 +103,22 @@ def run(log_dir, config_name, trial):
     
     
     # LEARN
-    for i in range(iterations):
+    for i in range(agent.t, iterations):
         if i % (iterations/10) == 0:
             print "Iteration", i
         context = environment.get_current_context()
         m = agent.produce(context)
         s = environment.update(m)
         agent.perceive(s)
+        metrics.tick()
+        
+        if eval_every and (i + 1) % eval_every == 0:
+            if background is not None:
+                background.start(agent, environment)
+            else:
+                evaluations.append(evaluation.evaluate(agent, environment))
+        if background is not None:
+            background.poll()
         
         if environment.produced_sound:
             if agent.mid_control == "mod10": 
@@ -108,6 +155,9 @@ def run(log_dir, config_name, trial):
     
     print "Time for", iterations, "iterations:", time.time() - t0, "sec"
     print "Time per iteration", 1000*(time.time() - t0)/iterations, "ms"
+    if profile:
+        metrics.print_stats()
+        metrics.disable()
     
     social_tool_use = dict(
                            count_social_tool_1=count_social_tool_1,
@@ -115,69 +165,21 @@ def run(log_dir, config_name, trial):
     
     
     
+    if background is not None:
+        evaluations = background.join()
+    
     # ANALYSE COMPETENCE ERROR
-    n_goals = 100
-    
-    eval_results = {}
-    
-    for region in [1, 2, 3]:        
-        eval_results[region] = {}
-        for i in range(n_goals):
-            eval_results[region][i] = {}
-            environment.reset_toys(region=region)
-            for toy in ["toy1", "toy2", "toy3"]:
-                eval_results[region][i][toy] = {}
-                                        
-                if toy == "toy1":
-                    goal = [environment.current_toy1[0] * (1. - t) / 2. for t in [0., 0.3, 0.5, 0.8, 1.]] + \
-                           [environment.current_toy1[1] * (1. - t) / 2. for t in [0., 0.3, 0.5, 0.8, 1.]]
-                    arm_mid = "mod3"
-                    diva_mid = "mod10"
-                    
-                context = list(agent.modules[arm_mid].get_c(environment.get_current_context()))
-                dists, _ = agent.modules[arm_mid].sm.model.imodel.fmodel.dataset.nn_y(context+goal)
-                arm_dist = dists[0]
-                
-                if len(agent.modules[diva_mid].sm.model.imodel.fmodel.dataset) > 0:
-                    context = list(agent.modules[diva_mid].get_c(environment.get_current_context()))
-                    dists, _ = agent.modules[diva_mid].sm.model.imodel.fmodel.dataset.nn_y(context+goal)
-                    diva_dist = dists[0]
-                else:
-                    diva_dist = np.inf
-                
-                if arm_dist < diva_dist:
-                    m = agent.modules[arm_mid].inverse(np.array(context + goal), explore=False)            
-                    m = list(m) + [0.]*28
-                else:
-                    m = agent.modules[diva_mid].inverse(np.array(context + goal), explore=False)            
-                    m = [0.]*21 + list(m)
-                    
-                s = environment.update(m)
-                
-                if toy == "toy1":
-                    reached = s[30:40]
-                elif toy == "toy2":
-                    reached = s[40:50]
-                elif toy == "toy3":
-                    reached = s[50:60]
-                    
-                comp_error = np.linalg.norm(np.array(reached) - np.array(goal))
-                
-                eval_results[region][i][toy]["toy_pos"] = [goal[0], goal[5]]
-                eval_results[region][i][toy]["reached"] = not (reached[0] - reached[4]) == 0 
-                eval_results[region][i][toy]["tool"] = not (s[20] - s[24]) == 0 
-                eval_results[region][i][toy]["comp_error"] = comp_error
-                eval_results[region][i][toy]["arm_dist"] = arm_dist
-                eval_results[region][i][toy]["diva_dist"] = diva_dist
-        
-        
-    #print eval_results
+    results = evaluation.evaluate(agent, environment)
+    evaluation.close()
+    eval_results = competence_eval_results(results)
     
     
     # DUMP LOG
     log = dict(environment=environment.save(),
                agent=agent.save(),
                eval_results=eval_results,
+               eval_version=eval_version,
+               evaluations=evaluations,
                social_tool_use=social_tool_use,)
     
     
@@ -193,6 +195,8 @@ if __name__ == "__main__":
     log_dir = sys.argv[1]
     config_name = sys.argv[2]
     trial = sys.argv[3]
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    bootstrap_pool = sys.argv[5] if len(sys.argv) > 5 else None
     
-    run(log_dir, config_name, trial)
+    run(log_dir, config_name, trial, seed, bootstrap_pool)
     
\ No newline at end of file
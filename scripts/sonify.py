@@ -0,0 +1,99 @@
+import os
+import sys
+import wave
+import multiprocessing
+import numpy as np
+
+sys.path.append('../')
+
+from cogsci2017.environment.diva import DivaEnvironment, cogsci2017_config
+
+
+# Offline sonification of recorded vocal commands: the DIVA motor parameters of each row
+# of a .npy file (28 columns, or m (49) or m+s (105) vectors, e.g. a bootstrap pool, from
+# which the DIVA columns are taken) are synthesized by a pool of worker processes, each
+# with its own vocal tract (the DIVA environment of CogSci2017Environment alone, without ROS
+# nor the caregiver) and Octave session, into <out_dir>/sound-<row>.wav, and into one montage
+# <out_dir>/montage.wav with the start time of each sound in <out_dir>/montage.csv.
+# The commands of a module's dataset (e.g. mod13) can be saved with dataset_commands.
+# usage: python sonify.py <commands.npy> <out_dir> [n_workers] [every] [batch_size]
+
+
+rate = 11025
+gap = 0.2 # seconds of silence between two sounds of the montage
+m_diva = slice(21, 49)
+
+
+def dataset_commands(agent, mid="mod13"):
+    """ Motor commands of the dataset of a module of a Supervisor """
+    dataset = agent.modules[mid].sensorimotor_model.dataset
+    return np.array([dataset.get_x(i) for i in range(len(dataset))])
+
+
+def diva_commands(commands):
+    commands = np.asarray(commands)
+    if commands.shape[1] in [49, 105]:
+        return commands[:, m_diva]
+    assert commands.shape[1] == 28, "expected 28 DIVA parameters, m or m+s vectors"
+    return commands
+
+
+_diva = None
+
+def _init_worker():
+    global _diva
+    _diva = DivaEnvironment(**cogsci2017_config(audio=False))
+
+def _render(batch):
+    """ Sound waves (int16) of a batch of (row, command) """
+    waves = []
+    for row, m in batch:
+        sound = _diva.sound_wave(_diva.art_trajectory(_diva.compute_motor_command(m)))
+        waves.append((row, (np.clip(np.ravel(sound), -1., 1.) * 32767).astype(np.int16)))
+    return waves
+
+
+def wav_writer(filename):
+    w = wave.open(filename, 'wb')
+    w.setnchannels(1)
+    w.setsampwidth(2)
+    w.setframerate(rate)
+    return w
+
+
+def sonify(filename, out_dir, n_workers=multiprocessing.cpu_count(), every=1, batch_size=20):
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    commands = diva_commands(np.load(filename, mmap_mode='r'))
+    rows = range(0, len(commands), every)
+    batches = [[(row, np.array(commands[row])) for row in rows[i:i + batch_size]] for i in range(0, len(rows), batch_size)]
+    print len(rows), "sounds to render in", len(batches), "batches by", n_workers, "workers"
+
+    pool = multiprocessing.Pool(n_workers, initializer=_init_worker)
+    montage = wav_writer(os.path.join(out_dir, 'montage.wav'))
+    silence = np.zeros(int(gap * rate), dtype=np.int16).tostring()
+    t = 0.
+    with open(os.path.join(out_dir, 'montage.csv'), 'wb') as index:
+        index.write("row,file,start,duration\n")
+        for i, waves in enumerate(pool.imap(_render, batches)): # in order, for the montage
+            for row, sound in waves:
+                name = 'sound-{}.wav'.format(row)
+                w = wav_writer(os.path.join(out_dir, name))
+                w.writeframes(sound.tostring())
+                w.close()
+                montage.writeframes(sound.tostring() + silence)
+                index.write("{},{},{:.3f},{:.3f}\n".format(row, name, t, len(sound) / float(rate)))
+                t += len(sound) / float(rate) + gap
+            print "Batch", i + 1, "/", len(batches)
+    montage.close()
+    pool.close()
+    pool.join()
+
+
+if __name__ == "__main__":
+
+    sonify(sys.argv[1],
+           sys.argv[2],
+           int(sys.argv[3]) if len(sys.argv) > 3 else multiprocessing.cpu_count(),
+           int(sys.argv[4]) if len(sys.argv) > 4 else 1,
+           int(sys.argv[5]) if len(sys.argv) > 5 else 20)
@@ -13,7 +13,8 @@ environment = CogSci2017Environment(gui=False, audio=False)
 config = dict(m_mins=environment.conf.m_mins,
              m_maxs=environment.conf.m_maxs,
              s_mins=environment.conf.s_mins,
-             s_maxs=environment.conf.s_maxs)
+             s_maxs=environment.conf.s_maxs,
+             s_layout=environment.s_layout)
 
 agent = Supervisor(config, model_babbling="random", n_motor_babbling=1000, explo_noise=0.05, proba_imitate=0.5)
 